@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Measures how long a fresh interpreter takes to import this package and build the headless
+Timer, Fps and DirectoryManagement objects, compared to first importing cv2, pynput and
+imutils like the package used to do unconditionally"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARENT_DIR, PACKAGE_NAME = os.path.split(PACKAGE_DIR)
+EAGER_MODULES = ("cv2", "pynput", "imutils.video.pivideostream")
+
+STARTUP_CODE = """
+import sys
+import time
+import importlib
+start = time.perf_counter()
+failed = []
+for name in {eager_modules!r}:
+    try:
+        importlib.import_module(name)
+    except Exception:
+        failed.append(name)
+sys.path.insert(0, {parent_dir!r})
+package = importlib.import_module({package_name!r})
+package.ModulesPackage.Timer()
+package.ModulesPackage.Fps()
+package.ModulesPackage.DirectoryManagement.index_dir
+print(time.perf_counter() - start, *failed)
+"""
+
+
+def time_startup(eager):
+    """Returns seconds taken by one fresh interpreter and the eager modules it could not
+    import"""
+    code = STARTUP_CODE.format(eager_modules=EAGER_MODULES if eager else (),
+                               parent_dir=PARENT_DIR, package_name=PACKAGE_NAME)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True,
+                            text=True).stdout.split()
+    return float(output[0]), output[1:]
+
+
+def main():
+    """Runs both startup modes repeatedly and prints their median times as json"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for mode, eager in (("lazy", False), ("eager", True)):
+        times = []
+        failed = []
+        for _ in range(args.repeat):
+            elapsed, failed = time_startup(eager)
+            times.append(elapsed)
+        results[mode] = {"median_ms": statistics.median(times)*1000,
+                         "min_ms": min(times)*1000, "unavailable": failed}
+    results["speedup"] = results["eager"]["median_ms"]/results["lazy"]["median_ms"]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
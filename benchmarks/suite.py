@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""Benchmarks the ModulesPackage hot paths on synthetic data without a camera or display.
+
+'run' writes time and peak memory of every case as json and 'compare' flags cases that got
+slower than a saved baseline, for example:
+
+    python benchmarks/suite.py run --output baseline.json
+    python benchmarks/suite.py run --output current.json
+    python benchmarks/suite.py compare baseline.json current.json
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import resource
+import argparse
+import platform
+import importlib
+import statistics
+import tempfile
+import tracemalloc
+import numpy as np
+import cv2
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARENT_DIR, PACKAGE_NAME = os.path.split(PACKAGE_DIR)
+sys.path.insert(0, PARENT_DIR)
+ModulesPackage = importlib.import_module(PACKAGE_NAME).ModulesPackage
+
+
+class Case:
+    """One benchmarked function with its parameters and the number of calls per timing"""
+    def __init__(self, name, function, number=1, setup=None, teardown=None, **params):
+        self.name = name
+        self.function = function
+        self.number = number
+        self.setup = setup
+        self.teardown = teardown
+        self.params = params
+
+
+def measure(case, repeat):
+    """Returns timing and peak traced memory of a case, where each repeat calls it number
+    times"""
+    state = case.setup() if case.setup else None
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(case.number):
+                case.function(state)
+            times.append((time.perf_counter() - start)/case.number)
+
+        tracemalloc.start()
+        case.function(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if case.teardown:
+            case.teardown(state)
+    return {"median_s": statistics.median(times), "min_s": min(times), "repeat": repeat,
+            "number": case.number, "peak_bytes": peak, "params": case.params}
+
+
+def synthetic_frame(resolution, blobs, seed=0, colors=None, radius=8):
+    """Returns one deterministic frame of circles, red unless colors are given"""
+    backend = ModulesPackage.Frame.SyntheticBackend(resolution=resolution, framerate=0,
+                                                    blobs=blobs, radius=radius,
+                                                    colors=colors or [(0, 0, 255)]*blobs,
+                                                    seed=seed)
+    return backend.read(np.empty((resolution[1], resolution[0], 3), dtype=np.uint8))
+
+
+def make_image_dir(size, ext, resolution=(320, 240)):
+    """Writes a temporary directory of 'img<N>.ext' frames"""
+    target_dir = tempfile.mkdtemp(prefix="readdir_")
+    backend = ModulesPackage.Frame.SyntheticBackend(resolution=resolution, framerate=0)
+    frame = np.empty((resolution[1], resolution[0], 3), dtype=np.uint8)
+    for i in range(size):
+        cv2.imwrite(os.path.join(target_dir, "img" + str(i) + ext), backend.read(frame))
+    return target_dir
+
+
+def readdir_cases(sizes, exts):
+    """ReadDir.read() eagerly, on a worker pool and lazily over directory sizes and formats"""
+    cases = []
+    for size in sizes:
+        for ext in exts:
+            def setup(size=size, ext=ext):
+                return make_image_dir(size, ext)
+
+            def read(target_dir, **kwargs):
+                read_dir = ModulesPackage.DirectoryManagement.ReadDir(
+                    target_dir, ModulesPackage.READDIR_SLIDESHOW_MODE_DELAY,
+                    lazy=kwargs.pop("lazy", False))
+                read_dir.read(**kwargs)
+
+            for variant, kwargs in (("serial", {}), ("workers4", {"workers": 4}),
+                                    ("lazy", {"lazy": True})):
+                cases.append(Case(f"readdir_read/{variant}/{size}{ext}",
+                                  lambda target_dir, kwargs=kwargs: read(target_dir, **kwargs),
+                                  setup=setup, teardown=shutil.rmtree, size=size, ext=ext,
+                                  variant=variant))
+    return cases
+
+
+def writedir_cases(counts):
+    """WriteDir.add() with thousands of existing run folders"""
+    cases = []
+    for count in counts:
+        def setup(count=count):
+            target_dir = tempfile.mkdtemp(prefix="writedir_")
+            for i in range(count):
+                os.mkdir(os.path.join(target_dir, "run" + str(i)))
+            return target_dir
+
+        def add(target_dir):
+            cwd = os.getcwd()
+            try:
+                write_dir = ModulesPackage.DirectoryManagement.WriteDir(target_dir, "run0")
+                for _ in range(10):
+                    write_dir.add()
+            finally:
+                os.chdir(cwd)
+
+        cases.append(Case(f"writedir_add/{count}", add, setup=setup, teardown=shutil.rmtree,
+                          existing=count, adds=10))
+    return cases
+
+
+def colortracker_cases(resolutions, blob_counts):
+    """ColorTracker.processing(), track() and blobs() over resolutions and blob counts"""
+    cases = []
+    bounds = [(0, 50), (0, 50), (200, 255)]
+    for resolution in resolutions:
+        for blobs in blob_counts:
+            frame = synthetic_frame(resolution, blobs)
+            tracker = ModulesPackage.ColorTracker([255]*3, "bgr", "benchmark", bounds)
+            params = {"resolution": list(resolution), "blobs": blobs}
+            name = f"{resolution[0]}x{resolution[1]}/{blobs}"
+            cases.append(Case("colortracker_processing/" + name,
+                              lambda _, frame=frame, tracker=tracker: tracker.processing(frame),
+                              number=20, **params))
+            cases.append(Case("colortracker_track/" + name,
+                              lambda _, frame=frame, tracker=tracker: tracker.track(frame),
+                              number=20, **params))
+            cases.append(Case("colortracker_blobs/" + name,
+                              lambda _, frame=frame, tracker=tracker: tracker.blobs(frame),
+                              number=20, **params))
+    return cases
+
+
+def multicolortracker_cases(resolutions, color_counts):
+    """MultiColorTracker.processing() against converting once and running one ColorTracker
+    per color, over resolutions and numbers of hsv colors"""
+    cases = []
+    hues = [(0, 20), (20, 40), (40, 80), (80, 120), (120, 150), (150, 180)]
+    colors = [tuple(int(c) for c in cv2.cvtColor(np.uint8([[[(low + high)//2, 255, 255]]]),
+                                                 cv2.COLOR_HSV2BGR)[0, 0])
+              for low, high in hues]
+    for resolution in resolutions:
+        frame = synthetic_frame(resolution, 2*len(hues), colors=colors*2, radius=15)
+        for count in color_counts:
+            bounds = [[hue, (100, 255), (100, 255)] for hue in hues[:count]]
+            multi = ModulesPackage.MultiColorTracker({str(i): bound
+                                                      for i, bound in enumerate(bounds)},
+                                                     cv2.COLOR_BGR2HSV)
+            trackers = [ModulesPackage.ColorTracker([180, 255, 255], "hsv", "benchmark", bound)
+                        for bound in bounds]
+
+            def separate(_, frame=frame, trackers=trackers):
+                hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+                return [tracker.processing(hsv) for tracker in trackers]
+
+            params = {"resolution": list(resolution), "colors": count}
+            name = f"{resolution[0]}x{resolution[1]}/{count}"
+            cases.append(Case("multicolortracker_processing/" + name,
+                              lambda _, frame=frame, multi=multi: multi.processing(frame),
+                              number=20, **params))
+            cases.append(Case("colortracker_separate/" + name, separate, number=20, **params))
+    return cases
+
+
+def fps_cases(frames):
+    """Fps.close_timer() and calculate() over a long run"""
+    def run(_):
+        fps = ModulesPackage.Fps()
+        for _ in range(frames):
+            fps.open_timer()
+            fps.close_timer()
+        fps.calculate()
+        fps.stats()
+
+    return [Case(f"fps_close_timer/{frames}", run, frames=frames)]
+
+
+def keyboard_cases(events):
+    """Keyboard event production from the listener callbacks and consumption"""
+    keys = [types.SimpleNamespace(name=name) for name in ("left", "right", "up", "down")]
+    keys += [types.SimpleNamespace(char=char) for char in "abcd"]
+
+    def run(_):
+        keyboard = ModulesPackage.Keyboard()
+        for i in range(events):
+            key = keys[i % len(keys)]
+            keyboard._on_press(key)
+            keyboard._on_press(key)
+            keyboard._on_release(key)
+            if i % 16 == 0:
+                keyboard.get_events().drain()
+                keyboard.is_pressed("left")
+
+    return [Case(f"keyboard_events/{events}", run, events=events)]
+
+
+def run(args):
+    """Runs all cases matching the filter and writes the results as json"""
+    quick = args.quick
+    cases = (readdir_cases([20] if quick else [100, 1000], [".png", ".jpg"]) +
+             writedir_cases([500] if quick else [1000, 5000]) +
+             colortracker_cases([(320, 240)] if quick else [(320, 240), (640, 480), (1280, 720)],
+                                [1, 10] if quick else [1, 10, 50]) +
+             multicolortracker_cases([(320, 240)] if quick else [(320, 240), (640, 480)],
+                                     [1, 4] if quick else [1, 4, 6]) +
+             fps_cases(10000 if quick else 1000000) +
+             keyboard_cases(10000 if quick else 200000))
+    results = {}
+    for case in cases:
+        if args.filter and args.filter not in case.name:
+            continue
+        results[case.name] = measure(case, args.repeat)
+        print(f"{case.name:<56}{results[case.name]['median_s']*1000:>12.3f} ms", file=sys.stderr)
+
+    report = {"meta": {"time": time.time(), "python": platform.python_version(),
+                       "platform": platform.platform(), "numpy": np.__version__,
+                       "cv2": cv2.__version__, "quick": quick,
+                       "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss},
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+def compare(args):
+    """Prints time and memory ratios against a baseline and exits with 1 on regressions"""
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    with open(args.current) as current_file:
+        current = json.load(current_file)["results"]
+
+    regressions = []
+    print(f"{'case':<56}{'baseline ms':>13}{'current ms':>13}{'time':>8}{'memory':>8}")
+    for name in sorted(set(baseline) & set(current)):
+        time_ratio = current[name]["median_s"]/baseline[name]["median_s"]
+        memory_ratio = (current[name]["peak_bytes"] + 1)/(baseline[name]["peak_bytes"] + 1)
+        regressed = time_ratio > 1 + args.threshold or memory_ratio > 1 + args.threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<56}{baseline[name]['median_s']*1000:>13.3f}"
+              f"{current[name]['median_s']*1000:>13.3f}{time_ratio:>8.2f}{memory_ratio:>8.2f}"
+              f"{'  REGRESSION' if regressed else ''}")
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{name:<56}  only in {'baseline' if name in baseline else 'current'}")
+    if regressions:
+        print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+def main():
+    """Parses the command line and runs or compares benchmarks"""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", help="json file to write instead of stdout")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--filter", help="only run cases whose name contains this")
+    run_parser.add_argument("--quick", action="store_true", help="small sizes for smoke tests")
+    run_parser.set_defaults(handler=run)
+    compare_parser = subparsers.add_parser("compare", help="compare against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="allowed fractional slowdown before flagging")
+    compare_parser.set_defaults(handler=compare)
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
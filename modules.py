@@ -3,15 +3,44 @@
 
 import os
 import datetime
+import json
 import time
 import copy
+import collections
+import threading
+import concurrent.futures
 import queue
 import string
 import argparse
+import importlib
+import functools
+import heapq
+import itertools
+import csv
+import bisect
+import struct
+import ctypes
+import ctypes.util
+import re
+import abc
 import numpy as np
-import cv2
-from imutils.video.pivideostream import PiVideoStream
-import pynput
+
+
+class _LazyModule:
+    """Stands in for a heavy module until one of its attributes is first used, then imports it
+    and replaces itself in this module's globals so later lookups cost nothing extra"""
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self._name)
+        globals()[self._name] = module
+        return getattr(module, attribute)
+
+
+cv2 = _LazyModule("cv2")
+pynput = _LazyModule("pynput")
+asyncio = _LazyModule("asyncio")
 
 class ModulesPackage:
     """Contains basic framework of all modules utilized in this directory"""
@@ -19,13 +48,44 @@ class ModulesPackage:
     KEYBOARD_RELEASED_STATE = False
     KEYBOARD_ACTION_TYPE_TAP = "tap"
     KEYBOARD_ACTION_TYPE_HOLD = "hold"
+    KEYBOARD_OVERFLOW_DROP_OLDEST = "drop_oldest"
+    KEYBOARD_OVERFLOW_DROP_NEWEST = "drop_newest"
     READDIR_SLIDESHOW_MODE_KEYBOARD = "keyboard"
     READDIR_SLIDESHOW_MODE_DELAY = "delay"
+    FRAMESTORE_VERSION = 1
+    FRAMESTORE_HEADER_NAME = "header.json"
+    FRAMESTORE_INDEX_NAME = "index.npy"
+    FRAMESTORE_FRAMES_NAME = "frames.bin"
+    VIDEOSTORE_VERSION = 1
+    VIDEOSTORE_HEADER_NAME = "video.json"
+    VIDEOSTORE_VIDEO_NAME = "video.avi"
+    VIDEOSTORE_NUMS_NAME = "nums.npy"
+    VIDEOSTORE_KEYFRAMES_NAME = "keyframes.npy"
+    RECORDER_OVERFLOW_BLOCK = "block"
+    RECORDER_OVERFLOW_DROP_OLDEST = "drop_oldest"
+    DISPLAY_MODE_INLINE = "inline"
+    DISPLAY_MODE_THREADED = "threaded"
+    DISPLAY_MODE_HEADLESS = "headless"
+    PROFILER_FORMAT_TABLE = "table"
+    PROFILER_FORMAT_JSON = "json"
+    PROFILER_FORMAT_CHROME = "chrome"
+    MULTICOLORTRACKER_LUT_MIN_COLORS = 3
+    COLORTRACKER_BLOB_DTYPE = np.dtype([("label", np.int32), ("area", np.int32),
+                                        ("cx", np.float32), ("cy", np.float32),
+                                        ("x", np.int32), ("y", np.int32),
+                                        ("width", np.int32), ("height", np.int32),
+                                        ("color", np.float32, (3,))])
 
     @staticmethod
     def check_for_quit_request():
-        """Quits if 'q' key is pressed"""
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        """Quits if 'q' key is pressed, checking the key the display thread last saw instead
+        of waiting in cv2.waitKey when the default Display is not inline"""
+        display = ModulesPackage.Display.get_default()
+        if display.get_mode() == ModulesPackage.DISPLAY_MODE_INLINE:
+            quit_requested = cv2.waitKey(1) & 0xFF == ord('q')
+        else:
+            quit_requested = display.is_quit_requested()
+        if quit_requested:
             print(end="")
             raise ModulesPackage.Break()
 
@@ -35,42 +95,93 @@ class ModulesPackage:
     class TimerError(Exception):
         """Used to report errors from Timer class"""
 
+    class ReadDirError(Exception):
+        """Used to report errors from ReadDir class"""
+
+    class FrameStoreError(Exception):
+        """Used to report errors from FrameStore class"""
+
+    class VideoStoreError(Exception):
+        """Used to report errors from VideoStore class"""
+
+    class RecorderError(Exception):
+        """Used to report errors from Recorder class"""
+
+    class FrameError(Exception):
+        """Used to report errors from Frame class"""
+
+    class PipelineError(Exception):
+        """Used to report errors from Pipeline class"""
+
+    class MetricsError(Exception):
+        """Used to report errors from Metrics class"""
+
     class DirectoryManagement:
         """Manages the directory and has classes to write and read directories"""
+        @staticmethod
+        def index_dir(target_dir):
+            """Returns the text, extension and numerically sorted names of a directory of
+            images named like 'text<N>.ext', skipping partially written files, or None, None
+            and no names for an empty directory"""
+            names = [name for name in os.listdir(target_dir)
+                     if not ModulesPackage.DirectoryManagement.is_partial(name)]
+            if not names:
+                return None, None, []
+            text, ext = os.path.splitext(names[0])
+            text = ''.join(filter(str.isalpha, text))
+            nums = sorted(int(''.join(filter(str.isdigit, name))) for name in names)
+            return text, ext, [text + str(num) + ext for num in nums]
+
+        @staticmethod
+        def is_partial(name):
+            """Returns whether a name is a hidden or temporary file such as the ones Recorder
+            writes before renaming them into place"""
+            return name.startswith(".") or name.endswith(".tmp")
+
         class WriteDir:
             """Class with methods to add more directories with similar naming conventions"""
             def __init__(self, target_dir, first_dir_name):
                 self._target_dir = target_dir
+                self._target_path = os.path.abspath(target_dir)
                 self._first_dir_name = first_dir_name
-                self._names = []
-                self._nums = []
+                self._scanned = False
                 self._most_recent_dir = self._MostRecentDir()
                 self._new_folder = None
                 os.chdir(target_dir)
 
             def add(self):
                 """Follows naming conventions of the first directory and adds another one"""
-                self._names = os.listdir(self.get_target_dir())
-                self._nums = []
-                self._new_folder = None
-                if self._names:
-                    self._names = np.sort(self._names)
-                    self._nums = []
-                    for name in self._names:
-                        self._nums = np.append(self._nums, int(''.join(filter(str.isdigit, name))))
-                    self._most_recent_dir.calculate(self._names, self._nums)
-                    self._new_folder = (self._most_recent_dir.get_text() +
-                                        str(self._most_recent_dir.get_num()+1))
+                if not self._scanned:
+                    self._scan()
+                if self._most_recent_dir.get_name() is None:
+                    new_folder = self.get_first_dir_name()
                 else:
-                    self._new_folder = self.get_first_dir_name()
-                os.mkdir(self._new_folder)
-                os.chdir(self._new_folder)
+                    new_folder = self._most_recent_dir.get_next_name()
+                while True:
+                    try:
+                        os.mkdir(os.path.join(self._target_path, new_folder))
+                        break
+                    except FileExistsError:
+                        # Another process took this name first so move on past it
+                        self._most_recent_dir.update(new_folder)
+                        new_folder = self._most_recent_dir.get_next_name()
+                self._most_recent_dir.update(new_folder)
+                self._new_folder = new_folder
+                os.chdir(os.path.join(self._target_path, self._new_folder))
+
+            def _scan(self):
+                """Finds the most recent directory once so later adds only use memory"""
+                names = [entry.name for entry in os.scandir(self._target_path)
+                         if any(char.isdigit() for char in entry.name)]
+                if names:
+                    self._most_recent_dir.calculate(
+                        names, [int(''.join(filter(str.isdigit, name))) for name in names])
+                self._scanned = True
 
             def debug(self, debug):
                 """Prints out values of all variables for debugging"""
                 if debug:
-                    print("names: " + str(self._names))
-                    print("nums: " + str(self._nums))
+                    print("scanned: " + str(self._scanned))
                     self._most_recent_dir.debug(True)
                     print("newFolder: " + str(self._new_folder))
 
@@ -82,6 +193,27 @@ class ModulesPackage:
                 """Returns the first directory that was made in the target directory"""
                 return self._first_dir_name
 
+            def get_new_folder(self):
+                """Returns the name of the directory made by the last call to add"""
+                return self._new_folder
+
+            def open_frame_store(self, text="img", ext=".png"):
+                """Creates a frame store in the directory made by the last call to add"""
+                return ModulesPackage.DirectoryManagement.FrameStore(
+                    os.path.join(self._target_path, self.get_new_folder())).create(text, ext)
+
+            def open_video_store(self, text="img", ext=".png", **kwargs):
+                """Creates a video store in the directory made by the last call to add"""
+                return ModulesPackage.DirectoryManagement.VideoStore(
+                    os.path.join(self._target_path, self.get_new_folder())).create(text, ext,
+                                                                                   **kwargs)
+
+            def open_recorder(self, **kwargs):
+                """Starts a Recorder writing images into the directory made by the last call to
+                add"""
+                return ModulesPackage.DirectoryManagement.Recorder(
+                    os.path.join(self._target_path, self.get_new_folder()), **kwargs).start()
+
             class _MostRecentDir:
                 def __init__(self):
                     self._index = None
@@ -92,12 +224,25 @@ class ModulesPackage:
                 def calculate(self, names, nums):
                     """Calculates data on the most recent directory from the names and numbers of
                     all of them"""
-                    self._num = np.amax(nums)
-                    self._index = int(np.where(nums == self._num)[0])
+                    self._index = max(range(len(nums)), key=nums.__getitem__)
                     self._name = names[self._index]
                     self._num = int(''.join(filter(str.isdigit, self._name)))
                     self._text = ''.join(filter(str.isalpha, self._name))
 
+                def update(self, name):
+                    """Records a directory that was just made if it is more recent"""
+                    digits = ''.join(filter(str.isdigit, name))
+                    num = int(digits) if digits else 0
+                    if self._num is None or num > self._num:
+                        self._index = 0 if self._index is None else self._index + 1
+                        self._name = name
+                        self._num = num
+                        self._text = ''.join(filter(str.isalpha, name))
+
+                def get_next_name(self):
+                    """Returns the name that follows the most recent directory"""
+                    return self._text + str(self._num + 1)
+
                 def debug(self, debug):
                     """Prints out values of all variables for debugging"""
                     if debug:
@@ -124,14 +269,32 @@ class ModulesPackage:
 
         class ReadDir:
             """Class with methods to read and display from an images directory"""
-            def __init__(self, target_dir, mode, delay=250):
+            def __init__(self, target_dir, mode, delay=250, lazy=False,
+                         cache_bytes=256*1024*1024, prefetch_ahead=0, prefetch_behind=0,
+                         prefetch_workers=2, tail=False, follow_latest=False, label_images=True):
                 self._keyboard = ModulesPackage.Keyboard()
                 self._target_dir = target_dir
                 self._mode = mode
+                self._lazy = lazy
+                self._label_images = label_images
+                self._tail = tail
+                self._follow_latest = follow_latest
+                self._watcher = None
+                self._nums = []
+                self._cache = self._FrameCache(cache_bytes)
+                self._prefetcher = None
+                if prefetch_ahead or prefetch_behind:
+                    # Only used when images are decoded on demand, which is always the case for
+                    # video stores
+                    self._prefetcher = self._Prefetcher(self._load_image, self._cache,
+                                                        prefetch_ahead, prefetch_behind,
+                                                        prefetch_workers)
                 self._names = []
                 self._text = None
                 self._ext = None
                 self._images = []
+                self._store = None
+                self._video = None
                 self._img_num = 0
                 self._start_delay = None
                 self._delay = delay
@@ -144,55 +307,214 @@ class ModulesPackage:
                 self._left_tap_update = False
                 self._right_tap_update = False
 
+                if self._tail and not self._lazy:
+                    raise ModulesPackage.ReadDirError("Tailing a directory needs lazy=True so "
+                                                      "new images can be appended")
                 if self._mode == ModulesPackage.READDIR_SLIDESHOW_MODE_KEYBOARD:
                     self._keyboard.start()
 
-            def read(self):
-                """Cache or Load and Store the images in the target directory"""
-                self._names = os.listdir(self.get_target_dir())
-                self._text, self._ext = os.path.splitext(self._names[0])
-                self._text = ''.join(filter(str.isalpha, self._text))
-                for i, name in enumerate(self._names):
-                    self._names[i] = int(''.join(filter(str.isdigit, name)))
-                self._names.sort()
-                self._names = [self._text + str(name) + self._ext for name in self._names]
-
-                self._images = [None for name in self._names]
-                for i, name in enumerate(self._names):
-                    self._images[i] = cv2.imread(self._target_dir+r'/'+name)
-                    self._images[i] = cv2.putText(self._images[i], text=str(i), org=(0, 25),
-                                                  fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=1,
-                                                  color=(0, 255, 0), thickness=2,
-                                                  lineType=cv2.LINE_AA)
-                self._images = np.array(self._images)
+            def read(self, workers=None):
+                """Cache or Load and Store the images in the target directory, decoding on a
+                pool of workers threads if specified"""
+                self._cache.clear()
+                self._store = None
+                if self._watcher is not None:
+                    self._watcher.close()
+                    self._watcher = None
+                if self._video is not None:
+                    self._video.close()
+                    self._video = None
+                if ModulesPackage.DirectoryManagement.VideoStore.is_store(self.get_target_dir()):
+                    # Video frames are always decoded on demand through the cache since the
+                    # whole session may not fit in memory
+                    self._video = ModulesPackage.DirectoryManagement.VideoStore(
+                        self.get_target_dir()).open()
+                    self._text, self._ext = self._video.get_text(), self._video.get_ext()
+                    self._names = self._video.get_names()
+                    self._images = self._LazyImages(self._get_image, len(self._names))
+                    if self._prefetcher is not None:
+                        self._prefetcher.reset()
+                        self._prefetcher.schedule(self._img_num, 1, len(self._images))
+                    return
+                if ModulesPackage.DirectoryManagement.FrameStore.is_store(self.get_target_dir()):
+                    self._store = ModulesPackage.DirectoryManagement.FrameStore(
+                        self.get_target_dir()).open()
+                    self._text, self._ext = self._store.get_text(), self._store.get_ext()
+                    self._names = self._store.get_names()
+                    self._images = self._store.get_frames()
+                    return
+
+                if self._tail:
+                    # Watch before listing so no image completed in between is missed, the
+                    # duplicates this can report are skipped by refresh()
+                    self._watcher = self._DirWatcher(self.get_target_dir())
+                    self._text, self._ext, self._names, self._nums = None, None, [], []
+                    for name in sorted(os.listdir(self.get_target_dir())):
+                        if not ModulesPackage.DirectoryManagement.is_partial(name) and \
+                                self._parse_num(name) is not None:
+                            self._names.append(name)
+                    self._names.sort(key=self._parse_num)
+                    self._nums = [self._parse_num(name) for name in self._names]
+                else:
+                    self._text, self._ext, self._names = \
+                        ModulesPackage.DirectoryManagement.index_dir(self.get_target_dir())
+
+                if self._lazy:
+                    self._images = self._LazyImages(self._get_image, len(self._names))
+                    if self._prefetcher is not None:
+                        self._prefetcher.reset()
+                        self._prefetcher.schedule(self._img_num, 1, len(self._images))
+                    return
+
+                first = self._decode(0)
+                self._images = np.empty((len(self._names),) + first.shape, dtype=first.dtype)
+                self._images[0] = first
+                self._annotate(self._images[0], 0)
+                if workers is None or workers <= 1:
+                    for i in range(1, len(self._names)):
+                        self._load_image_into(i)
+                else:
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                        list(executor.map(self._load_image_into, range(1, len(self._names))))
+
+            def _decode(self, img_num):
+                """Decodes a single image from the target directory or its video store"""
+                if self._video is not None:
+                    return self._video.read_frame(img_num)
+                image = cv2.imread(self._target_dir+r'/'+self._names[img_num])
+                if image is None:
+                    raise ModulesPackage.ReadDirError(f"Could not decode image "
+                                                      f"{self._names[img_num]}")
+                return image
+
+            def _annotate(self, image, img_num):
+                """Labels an image in place with its position in the slideshow unless labeling
+                is turned off"""
+                if not self._label_images:
+                    return image
+                return cv2.putText(image, text=str(img_num), org=(0, 25),
+                                   fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=1,
+                                   color=(0, 255, 0), thickness=2, lineType=cv2.LINE_AA)
+
+            def _load_image(self, img_num):
+                """Decodes and labels a single image from the target directory"""
+                return self._annotate(self._decode(img_num), img_num)
+
+            def _load_image_into(self, img_num):
+                """Decodes and labels an image directly into its slot of the images array"""
+                image = self._decode(img_num)
+                if image.shape != self._images.shape[1:]:
+                    raise ModulesPackage.ReadDirError(f"Image {self._names[img_num]} has shape "
+                                                      f"{image.shape} instead of "
+                                                      f"{self._images.shape[1:]}")
+                self._images[img_num] = image
+                self._annotate(self._images[img_num], img_num)
+
+            def _get_image(self, img_num):
+                """Returns an image from the cache, decoding it on a miss"""
+                if self._prefetcher is not None:
+                    return self._prefetcher.get(img_num)
+                image = self._cache.get(img_num)
+                if image is None:
+                    image = self._load_image(img_num)
+                    self._cache.put(img_num, image)
+                return image
+
+            def refresh(self):
+                """Adds the images completed since the last read() or refresh() and returns
+                how many were added, keeping the current image selected unless following the
+                latest one"""
+                if self._watcher is None:
+                    raise ModulesPackage.ReadDirError("Refreshing needs a ReadDir opened with "
+                                                      "tail=True and read() called first")
+                added = 0
+                reordered = False
+                for name in self._watcher.poll():
+                    num = self._parse_num(name)
+                    if num is None:
+                        continue
+                    if not self._nums or num > self._nums[-1]:
+                        self._nums.append(num)
+                        self._names.append(name)
+                    else:
+                        index = bisect.bisect_left(self._nums, num)
+                        if self._nums[index] == num:
+                            continue
+                        self._nums.insert(index, num)
+                        self._names.insert(index, name)
+                        if index <= self._img_num:
+                            self._img_num += 1
+                        reordered = True
+                    added += 1
+
+                if added:
+                    if reordered:
+                        # Cached images are keyed and labeled by their position which moved
+                        self._cache.clear()
+                        if self._prefetcher is not None:
+                            self._prefetcher.reset()
+                    self._images.set_length(len(self._names))
+                    if self._follow_latest:
+                        self._img_num = len(self._names) - 1
+                    if self._prefetcher is not None:
+                        self._prefetcher.schedule(self._img_num, 1, len(self._images))
+                return added
+
+            def _parse_num(self, name):
+                """Returns the number of an image named like 'text<N>.ext' or None if the name
+                does not follow the directory's naming, taking the naming from the first image
+                if there was none"""
+                stem, ext = os.path.splitext(name)
+                text = stem.rstrip(string.digits)
+                if not ext or text == stem:
+                    return None
+                if self._text is None:
+                    self._text, self._ext = text, ext
+                if text != self._text or ext != self._ext:
+                    return None
+                return int(stem[len(text):])
 
             def imshow(self):
                 """Display the image that is next up in the slideshow"""
+                if not len(self._images):
+                    return
                 if self._mode == ModulesPackage.READDIR_SLIDESHOW_MODE_DELAY:
                     if not self._start_delay:
-                        cv2.imshow("slideshow", self._images[self._img_num])
+                        ModulesPackage.Display.get_default().show("slideshow",
+                                                                  self._get_display_image())
                 elif self._mode == ModulesPackage.READDIR_SLIDESHOW_MODE_KEYBOARD:
-                    cv2.imshow("slideshow", self._images[self._img_num])
+                    ModulesPackage.Display.get_default().show("slideshow",
+                                                              self._get_display_image())
+
+            def _get_display_image(self):
+                """Returns the current image, labeling a copy if it comes from a frame store"""
+                if self._store is not None:
+                    return self._annotate(self._images[self._img_num].copy(), self._img_num)
+                return self._images[self._img_num]
 
             def update(self):
                 """Check if delay is completed or if delay needs to be reset"""
+                if self._watcher is not None:
+                    self.refresh()
+                img_num = self._img_num
                 if self._mode == ModulesPackage.READDIR_SLIDESHOW_MODE_DELAY:
                     if not self._start_delay:
                         self._img_num += 1
                         if self._img_num >= len(self._images):
-                            raise ModulesPackage.Break
+                            if self._watcher is None:
+                                raise ModulesPackage.Break
+                            # Wait on the last image for the next one to be completed
+                            self._img_num = max(len(self._images) - 1, 0)
                         self._start_delay = datetime.datetime.now()
                     elif (datetime.datetime.now() - self._start_delay).total_seconds() >= (self._delay/1000.0):
                         self._start_delay = None
                 elif self._mode == ModulesPackage.READDIR_SLIDESHOW_MODE_KEYBOARD:
-                    while not self._keyboard.get_events().empty():
-                        event = self._keyboard.get_events().get()
-                        if event.get_name() == self._left_key:
-                            self._left_key_state = event.get_state()
-                            self._left_key_action_type = event.get_action_type()
-                        elif event.get_name() == self._right_key:
-                            self._right_key_state = event.get_state()
-                            self._right_key_action_type = event.get_action_type()
+                    left_key = self._keyboard.get_key_state(self._left_key)
+                    self._left_key_state = left_key.get_state()
+                    self._left_key_action_type = left_key.get_action_type()
+                    right_key = self._keyboard.get_key_state(self._right_key)
+                    self._right_key_state = right_key.get_state()
+                    self._right_key_action_type = right_key.get_action_type()
 
                     if self._left_key_state == ModulesPackage.KEYBOARD_PRESSED_STATE and self._img_num > 0:
                         if self._left_key_action_type == ModulesPackage.KEYBOARD_ACTION_TYPE_TAP and not self._left_tap_update:
@@ -212,10 +534,21 @@ class ModulesPackage:
                     elif self._right_key_state == ModulesPackage.KEYBOARD_RELEASED_STATE:
                         self._right_tap_update = False
 
+                if self._prefetcher is not None and self._img_num != img_num and \
+                        isinstance(self._images, self._LazyImages):
+                    self._prefetcher.schedule(self._img_num, 1 if self._img_num > img_num else -1,
+                                              len(self._images))
+
             def close(self):
-                """Deactivates keyboard if necessary"""
+                """Deactivates keyboard, prefetching and the video store if necessary"""
                 if self._mode == ModulesPackage.READDIR_SLIDESHOW_MODE_KEYBOARD:
                     self._keyboard.stop()
+                if self._prefetcher is not None:
+                    self._prefetcher.stop()
+                if self._video is not None:
+                    self._video.close()
+                if self._watcher is not None:
+                    self._watcher.close()
 
             def get_target_dir(self):
                 """Return name of target directory"""
@@ -226,18 +559,820 @@ class ModulesPackage:
                 return self._names
 
             def get_images(self):
-                """Return images in the target directory"""
+                """Return images in the target directory, as a read only memmap view if the
+                target directory is a frame store"""
                 return self._images
 
             def get_mode(self):
                 """Returns mode of image slideshow"""
                 return self._mode
 
+            def is_lazy(self):
+                """Returns whether images are decoded on demand instead of in read()"""
+                return self._lazy or self._video is not None
+
+            def is_tailing(self):
+                """Returns whether new images in the target directory are picked up by
+                refresh()"""
+                return self._watcher is not None
+
+            def get_video_store(self):
+                """Returns the video store being read or None if the target directory is not
+                one"""
+                return self._video
+
+            def get_cache(self):
+                """Returns the cache of decoded images used in lazy mode"""
+                return self._cache
+
+            def get_prefetch_stats(self):
+                """Returns prefetch hit, late and miss counts or None if prefetching is off"""
+                if self._prefetcher is None:
+                    return None
+                return self._prefetcher.get_stats()
+
+            class _DirWatcher:
+                """Reports files completed in a directory since the last poll, from inotify
+                close and rename events where available and otherwise by rescanning only when
+                the directory changes and accepting files once their size stops changing"""
+                _IN_CLOSE_WRITE = 0x00000008
+                _IN_MOVED_TO = 0x00000080
+                _IN_Q_OVERFLOW = 0x00004000
+                _IN_NONBLOCK = 0o4000
+                _IN_CLOEXEC = 0o2000000
+                _EVENT_HEADER = struct.Struct("iIII")
+
+                def __init__(self, target_dir, use_inotify=True):
+                    self._target_dir = target_dir
+                    self._fd = None
+                    self._known = set()
+                    self._pending = {}
+                    self._mtime = None
+                    if use_inotify:
+                        self._fd = self._open_inotify(target_dir)
+                    if self._fd is None:
+                        self._mtime = os.stat(target_dir).st_mtime_ns
+                        self._known = set(os.listdir(target_dir))
+
+                @classmethod
+                def _open_inotify(cls, target_dir):
+                    """Returns an inotify descriptor watching the directory or None if inotify
+                    is not available"""
+                    libc_name = ctypes.util.find_library("c")
+                    if libc_name is None:
+                        return None
+                    libc = ctypes.CDLL(libc_name, use_errno=True)
+                    if not hasattr(libc, "inotify_init1"):
+                        return None
+                    fd = libc.inotify_init1(cls._IN_NONBLOCK | cls._IN_CLOEXEC)
+                    if fd < 0:
+                        return None
+                    if libc.inotify_add_watch(fd, os.fsencode(target_dir),
+                                              cls._IN_CLOSE_WRITE | cls._IN_MOVED_TO) < 0:
+                        os.close(fd)
+                        return None
+                    return fd
+
+                def poll(self):
+                    """Returns the names of files completed since the last poll"""
+                    if self._fd is not None:
+                        return self._poll_inotify()
+                    return self._poll_stat()
+
+                def _poll_inotify(self):
+                    """Reads the queued inotify events without blocking"""
+                    names = []
+                    while True:
+                        try:
+                            buffer = os.read(self._fd, 64*1024)
+                        except BlockingIOError:
+                            break
+                        offset = 0
+                        while offset < len(buffer):
+                            _, mask, _, length = self._EVENT_HEADER.unpack_from(buffer, offset)
+                            offset += self._EVENT_HEADER.size
+                            name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+                            offset += length
+                            if mask & self._IN_Q_OVERFLOW:
+                                # Events were lost so report everything and let the caller
+                                # skip the ones it already has
+                                names.extend(os.listdir(self._target_dir))
+                            elif name:
+                                names.append(name)
+                    is_partial = ModulesPackage.DirectoryManagement.is_partial
+                    return [name for name in names if not is_partial(name)]
+
+                def _poll_stat(self):
+                    """Rescans the directory only if its mtime changed and checks the sizes of
+                    files seen growing before"""
+                    mtime = os.stat(self._target_dir).st_mtime_ns
+                    sizes = {}
+                    if mtime != self._mtime:
+                        self._mtime = mtime
+                        with os.scandir(self._target_dir) as entries:
+                            for entry in entries:
+                                if entry.name not in self._known and not \
+                                        ModulesPackage.DirectoryManagement.is_partial(
+                                            entry.name):
+                                    try:
+                                        sizes[entry.name] = entry.stat().st_size
+                                    except FileNotFoundError:
+                                        pass
+                    for name in self._pending:
+                        if name not in sizes:
+                            try:
+                                sizes[name] = os.stat(os.path.join(self._target_dir,
+                                                                   name)).st_size
+                            except FileNotFoundError:
+                                pass
+
+                    names = []
+                    pending = {}
+                    for name, size in sizes.items():
+                        if size and self._pending.get(name) == size:
+                            self._known.add(name)
+                            names.append(name)
+                        else:
+                            pending[name] = size
+                    self._pending = pending
+                    return names
+
+                def close(self):
+                    """Stops watching the directory"""
+                    if self._fd is not None:
+                        os.close(self._fd)
+                        self._fd = None
+
+                def is_inotify(self):
+                    """Returns whether inotify is used instead of polling"""
+                    return self._fd is not None
+
+            class _Prefetcher:
+                """Decodes images around the slideshow cursor on a thread pool before they are
+                displayed"""
+                def __init__(self, loader, cache, ahead, behind, workers):
+                    self._loader = loader
+                    self._cache = cache
+                    self._ahead = ahead
+                    self._behind = behind
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=workers, thread_name_prefix="ReadDirPrefetch")
+                    self._pending = {}
+                    self._lock = threading.Lock()
+                    self._generation = 0
+                    self._last_img_num = None
+                    self._hits = 0
+                    self._late = 0
+                    self._misses = 0
+
+                def get(self, img_num):
+                    """Returns an image, counting whether prefetching had it ready"""
+                    first_access = img_num != self._last_img_num
+                    self._last_img_num = img_num
+                    image = self._cache.get(img_num)
+                    if image is not None:
+                        self._hits += first_access
+                        return image
+                    with self._lock:
+                        future = self._pending.get(img_num)
+                    if future is not None and not future.cancelled():
+                        self._late += first_access
+                        return future.result()
+                    self._misses += first_access
+                    image = self._loader(img_num)
+                    self._cache.put(img_num, image)
+                    return image
+
+                def schedule(self, img_num, direction, length):
+                    """Queues decoding of the window around img_num in the direction of travel
+                    and cancels queued work that fell out of it"""
+                    window = [img_num + direction*offset for offset in range(1, self._ahead+1)]
+                    window += [img_num - direction*offset for offset in range(1, self._behind+1)]
+                    window = [i for i in window if 0 <= i < length]
+                    with self._lock:
+                        for i in list(self._pending):
+                            if i not in window and self._pending[i].cancel():
+                                del self._pending[i]
+                        for i in window:
+                            if i not in self._pending and self._cache.get(i) is None:
+                                self._pending[i] = self._executor.submit(self._decode, i,
+                                                                         self._generation)
+
+                def _decode(self, img_num, generation):
+                    """Worker task that decodes one image into the cache, forgetting it on
+                    failure so the next access or schedule retries"""
+                    try:
+                        image = self._loader(img_num)
+                    except Exception:
+                        with self._lock:
+                            if generation == self._generation:
+                                self._pending.pop(img_num, None)
+                        raise
+                    with self._lock:
+                        if generation == self._generation:
+                            self._cache.put(img_num, image)
+                            self._pending.pop(img_num, None)
+                    return image
+
+                def reset(self):
+                    """Drops queued work so results for a previous read() are not cached"""
+                    with self._lock:
+                        self._generation += 1
+                        for future in self._pending.values():
+                            future.cancel()
+                        self._pending.clear()
+                    self._last_img_num = None
+
+                def stop(self):
+                    """Cancels queued work and shuts down the worker threads"""
+                    self.reset()
+                    self._executor.shutdown(wait=True)
+
+                def debug(self, debug):
+                    """Prints out values of all variables for debugging"""
+                    if debug:
+                        print("ahead: " + str(self._ahead))
+                        print("behind: " + str(self._behind))
+                        print("pending: " + str(sorted(self._pending)))
+                        print("stats: " + str(self.get_stats()))
+
+                def get_stats(self):
+                    """Returns counts of images that were ready, still decoding or not queued
+                    when first displayed"""
+                    return {"hits": self._hits, "late": self._late, "misses": self._misses}
+
+            class _LazyImages:
+                """Sequence of images that are decoded only when indexed"""
+                def __init__(self, loader, length):
+                    self._loader = loader
+                    self._length = length
+
+                def __len__(self):
+                    return self._length
+
+                def set_length(self, length):
+                    """Changes the number of images when images are added to the directory"""
+                    self._length = length
+
+                def __getitem__(self, index):
+                    if isinstance(index, slice):
+                        return np.array([self._loader(i)
+                                         for i in range(*index.indices(self._length))])
+                    if index < 0:
+                        index += self._length
+                    if not 0 <= index < self._length:
+                        raise IndexError("image index out of range")
+                    return self._loader(index)
+
+            class _FrameCache:
+                """Least recently used cache of decoded images bounded by a byte budget"""
+                def __init__(self, max_bytes):
+                    self._max_bytes = max_bytes
+                    self._images = collections.OrderedDict()
+                    self._nbytes = 0
+                    self._lock = threading.Lock()
+
+                def get(self, key):
+                    """Returns the cached image or None and marks it as most recently used"""
+                    with self._lock:
+                        image = self._images.get(key)
+                        if image is not None:
+                            self._images.move_to_end(key)
+                        return image
+
+                def put(self, key, image):
+                    """Stores an image and evicts the least recently used ones over budget"""
+                    with self._lock:
+                        if key in self._images:
+                            self._nbytes -= self._images.pop(key).nbytes
+                        if image.nbytes > self._max_bytes:
+                            return
+                        self._images[key] = image
+                        self._nbytes += image.nbytes
+                        while self._nbytes > self._max_bytes:
+                            _, evicted = self._images.popitem(last=False)
+                            self._nbytes -= evicted.nbytes
+
+                def clear(self):
+                    """Removes all cached images"""
+                    with self._lock:
+                        self._images.clear()
+                        self._nbytes = 0
+
+                def debug(self, debug):
+                    """Prints out values of all variables for debugging"""
+                    if debug:
+                        print("cached images: " + str(len(self._images)))
+                        print("nbytes: " + str(self._nbytes))
+                        print("max_bytes: " + str(self._max_bytes))
+
+                def get_nbytes(self):
+                    """Returns number of bytes currently held by the cache"""
+                    return self._nbytes
+
+                def get_max_bytes(self):
+                    """Returns byte budget of the cache"""
+                    return self._max_bytes
+
+        class _Store:
+            """Shared parts of FrameStore and VideoStore, which keep frames in a directory with
+            a json header holding their naming and a saved array of their numbers"""
+            def __init__(self, target_dir, header_name, version, error):
+                self._target_dir = target_dir
+                self._header_name = header_name
+                self._version = version
+                self._error = error
+                self._header = None
+                self._nums = []
+
+            @classmethod
+            def convert(cls, src_dir, dst_dir, workers=None, **kwargs):
+                """Converts a directory of images named like 'text<N>.ext' into a store,
+                decoding on a pool of worker threads if specified with at most two decoded
+                images per worker waiting to be written"""
+                text, ext, names = ModulesPackage.DirectoryManagement.index_dir(src_dir)
+                store = cls(dst_dir).create(text, ext, **kwargs)
+
+                def decode(name):
+                    image = cv2.imread(os.path.join(src_dir, name))
+                    if image is None:
+                        raise store._error(f"Could not decode image {name}")
+                    return image
+
+                nums = [int(''.join(filter(str.isdigit, name))) for name in names]
+                max_in_flight = 2*(workers or 1)
+                pending = collections.deque()
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers or 1) as executor:
+                    try:
+                        for num, name in zip(nums, names):
+                            pending.append((num, executor.submit(decode, name)))
+                            if len(pending) >= max_in_flight:
+                                num, image = pending.popleft()
+                                store.write(image.result(), num)
+                        while pending:
+                            num, image = pending.popleft()
+                            store.write(image.result(), num)
+                    finally:
+                        for _, image in pending:
+                            image.cancel()
+                store.close()
+                return store.open()
+
+            def _read_header(self):
+                """Loads the header and checks that this version can read it"""
+                with open(self._path(self._header_name)) as header_file:
+                    self._header = json.load(header_file)
+                if self._header.get("version") != self._version:
+                    raise self._error(f"Unsupported store version "
+                                      f"{self._header.get('version')}")
+
+            def _path(self, name):
+                """Returns the path of a file in the store"""
+                return os.path.join(self._target_dir, name)
+
+            def _write_header(self):
+                """Writes the header atomically so readers never see a partial one"""
+                tmp_path = self._path(self._header_name + ".tmp")
+                with open(tmp_path, "w") as header_file:
+                    json.dump(self._header, header_file)
+                os.replace(tmp_path, self._path(self._header_name))
+
+            def get_target_dir(self):
+                """Returns the directory of the store"""
+                return self._target_dir
+
+            def get_nums(self):
+                """Returns the frame numbers in storage order"""
+                return self._nums
+
+            def get_names(self):
+                """Returns the 'text<N>.ext' names the frames had or would have as images"""
+                return [self.get_text() + str(num) + self.get_ext() for num in self._nums]
+
+            def get_text(self):
+                """Returns the text of the frame names"""
+                return self._header["text"]
+
+            def get_ext(self):
+                """Returns the extension of the frame names"""
+                return self._header["ext"]
+
+            def get_count(self):
+                """Returns the number of frames"""
+                return self._header["count"]
+
+        class FrameStore(_Store):
+            """Stores frames of equal shape in one raw memory mapped file alongside a small
+            json header and an index of frame numbers"""
+            def __init__(self, target_dir):
+                super().__init__(target_dir, ModulesPackage.FRAMESTORE_HEADER_NAME,
+                                 ModulesPackage.FRAMESTORE_VERSION, ModulesPackage.FrameStoreError)
+                self._frames = None
+                self._file = None
+
+            @staticmethod
+            def is_store(target_dir):
+                """Returns whether the directory holds a frame store"""
+                return os.path.isfile(os.path.join(target_dir,
+                                                   ModulesPackage.FRAMESTORE_HEADER_NAME))
+
+            def create(self, text="img", ext=".png"):
+                """Starts a new empty frame store for writing"""
+                os.makedirs(self._target_dir, exist_ok=True)
+                self._header = {"version": ModulesPackage.FRAMESTORE_VERSION, "text": text,
+                                "ext": ext, "count": 0, "shape": None, "dtype": None}
+                self._nums = []
+                self._frames = None
+                self._file = open(self._path(ModulesPackage.FRAMESTORE_FRAMES_NAME), "wb")
+                self._write_header()
+                return self
+
+            def write(self, frame, num=None):
+                """Appends a frame, numbered one after the previous frame if not specified"""
+                if self._file is None:
+                    raise ModulesPackage.FrameStoreError("Frame store is not open for writing. "
+                                                         "Use .create() to start it")
+                if self._header["shape"] is None:
+                    self._header["shape"] = list(frame.shape)
+                    self._header["dtype"] = frame.dtype.str
+                elif (list(frame.shape) != self._header["shape"] or
+                      frame.dtype.str != self._header["dtype"]):
+                    raise ModulesPackage.FrameStoreError(f"Frame of shape {frame.shape} does "
+                                                         f"not match store shape "
+                                                         f"{tuple(self._header['shape'])}")
+                if num is None:
+                    num = self._nums[-1] + 1 if self._nums else 0
+                self._file.write(np.ascontiguousarray(frame).data)
+                self._nums.append(num)
+                self._header["count"] += 1
+
+            def close(self):
+                """Finishes writing by flushing frames, index and header to disk"""
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                    np.save(self._path(ModulesPackage.FRAMESTORE_INDEX_NAME),
+                            np.array(self._nums, dtype=np.int64))
+                    self._write_header()
+
+            def open(self):
+                """Maps the frames of an existing frame store without copying them"""
+                self._read_header()
+                self._nums = np.load(self._path(ModulesPackage.FRAMESTORE_INDEX_NAME))
+                if self._header["count"]:
+                    self._frames = np.memmap(self._path(ModulesPackage.FRAMESTORE_FRAMES_NAME),
+                                             dtype=np.dtype(self._header["dtype"]), mode="r",
+                                             shape=(self._header["count"],
+                                                    *self._header["shape"]))
+                else:
+                    self._frames = np.empty((0,), dtype=np.uint8)
+                return self
+
+            def debug(self, debug):
+                """Prints out values of all variables for debugging"""
+                if debug:
+                    print("target_dir: " + str(self._target_dir))
+                    print("header: " + str(self._header))
+                    print("nums: " + str(self._nums))
+
+            def get_frames(self):
+                """Returns the read only memmap of all frames"""
+                return self._frames
+
+        class VideoStore(_Store):
+            """Stores frames in one compressed video container alongside a json header, the
+            frame numbers and a keyframe index so any frame is decoded from the keyframe before
+            it instead of from the start"""
+            def __init__(self, target_dir):
+                super().__init__(target_dir, ModulesPackage.VIDEOSTORE_HEADER_NAME,
+                                 ModulesPackage.VIDEOSTORE_VERSION, ModulesPackage.VideoStoreError)
+                self._keyframes = None
+                self._writer = None
+                self._writing = False
+                self._capture = None
+                self._position = 0
+                self._lock = threading.Lock()
+                self._seeks = 0
+                self._grabs = 0
+                self._reads = 0
+
+            @staticmethod
+            def is_store(target_dir):
+                """Returns whether the directory holds a video store"""
+                return os.path.isfile(os.path.join(target_dir,
+                                                   ModulesPackage.VIDEOSTORE_HEADER_NAME))
+
+            def create(self, text="img", ext=".png", fourcc="MJPG", fps=30.0):
+                """Starts a new empty video store for writing, where MJPG keeps every frame a
+                keyframe and inter frame codecs like mp4v trade seek cost for size"""
+                os.makedirs(self._target_dir, exist_ok=True)
+                self._header = {"version": ModulesPackage.VIDEOSTORE_VERSION, "text": text,
+                                "ext": ext, "fourcc": fourcc, "fps": fps, "count": 0,
+                                "shape": None}
+                self._nums = []
+                self._keyframes = None
+                self._writer = None
+                self._writing = True
+                return self
+
+            def write(self, frame, num=None):
+                """Encodes a frame, numbered one after the previous frame if not specified"""
+                if not self._writing:
+                    raise ModulesPackage.VideoStoreError("Video store is not open for writing. "
+                                                         "Use .create() to start it")
+                if self._header["shape"] is None:
+                    if frame.ndim != 3 or frame.shape[2] != 3 or frame.dtype != np.uint8:
+                        raise ModulesPackage.VideoStoreError(f"Video store needs 8 bit BGR "
+                                                             f"frames, not {frame.shape} "
+                                                             f"{frame.dtype}")
+                    self._header["shape"] = list(frame.shape)
+                    self._writer = cv2.VideoWriter(
+                        self._path(ModulesPackage.VIDEOSTORE_VIDEO_NAME),
+                        cv2.VideoWriter_fourcc(*self._header["fourcc"]), self._header["fps"],
+                        (frame.shape[1], frame.shape[0]))
+                    if not self._writer.isOpened():
+                        raise ModulesPackage.VideoStoreError(f"Could not open video writer with "
+                                                             f"codec {self._header['fourcc']}")
+                elif list(frame.shape) != self._header["shape"]:
+                    raise ModulesPackage.VideoStoreError(f"Frame of shape {frame.shape} does "
+                                                         f"not match store shape "
+                                                         f"{tuple(self._header['shape'])}")
+                if num is None:
+                    num = self._nums[-1] + 1 if self._nums else 0
+                self._writer.write(frame)
+                self._nums.append(num)
+                self._header["count"] += 1
+
+            def close(self):
+                """Finishes writing by saving the frame numbers, header and keyframe index, or
+                releases the video when reading"""
+                if self._writing:
+                    self._writing = False
+                    if self._writer is not None:
+                        self._writer.release()
+                        self._writer = None
+                    np.save(self._path(ModulesPackage.VIDEOSTORE_NUMS_NAME),
+                            np.array(self._nums, dtype=np.int64))
+                    self._write_header()
+                    self._build_index()
+                with self._lock:
+                    if self._capture is not None:
+                        self._capture.release()
+                        self._capture = None
+
+            def open(self):
+                """Opens an existing video store for random access, building its keyframe index
+                first if it is missing"""
+                self._read_header()
+                self._nums = np.load(self._path(ModulesPackage.VIDEOSTORE_NUMS_NAME))
+                if os.path.isfile(self._path(ModulesPackage.VIDEOSTORE_KEYFRAMES_NAME)):
+                    self._keyframes = np.load(
+                        self._path(ModulesPackage.VIDEOSTORE_KEYFRAMES_NAME))
+                else:
+                    self._build_index()
+                if self._header["count"]:
+                    self._capture = cv2.VideoCapture(
+                        self._path(ModulesPackage.VIDEOSTORE_VIDEO_NAME))
+                    if not self._capture.isOpened():
+                        raise ModulesPackage.VideoStoreError(f"Could not open video in "
+                                                             f"{self._target_dir}")
+                    self._position = 0
+                return self
+
+            def _build_index(self):
+                """Finds the keyframes by reading the compressed packets without decoding them,
+                treating every frame as one if the backend cannot report them"""
+                if not self._header["count"]:
+                    self._keyframes = np.empty((0,), dtype=np.int64)
+                    np.save(self._path(ModulesPackage.VIDEOSTORE_KEYFRAMES_NAME), self._keyframes)
+                    return
+                capture = cv2.VideoCapture(self._path(ModulesPackage.VIDEOSTORE_VIDEO_NAME),
+                                           cv2.CAP_FFMPEG)
+                keyframes = []
+                if capture.isOpened() and capture.set(cv2.CAP_PROP_FORMAT, -1):
+                    index = 0
+                    while capture.grab():
+                        if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                            keyframes.append(index)
+                        index += 1
+                    if index != self._header["count"]:
+                        raise ModulesPackage.VideoStoreError(f"Video has {index} frames but "
+                                                             f"the header records "
+                                                             f"{self._header['count']}")
+                else:
+                    keyframes = range(self._header["count"])
+                capture.release()
+                self._keyframes = np.array(keyframes, dtype=np.int64)
+                np.save(self._path(ModulesPackage.VIDEOSTORE_KEYFRAMES_NAME), self._keyframes)
+
+            def read_frame(self, index):
+                """Decodes one frame, reading on from the current position when the target is
+                before the next keyframe and seeking to the keyframe before it otherwise"""
+                if not 0 <= index < self._header["count"]:
+                    raise IndexError("frame index out of range")
+                with self._lock:
+                    if self._capture is None:
+                        raise ModulesPackage.VideoStoreError("Video store is not open for "
+                                                             "reading. Use .open() to start it")
+                    if index != self._position:
+                        keyframe = int(self._keyframes[
+                            max(np.searchsorted(self._keyframes, index, side="right") - 1, 0)])
+                        if index < self._position or keyframe > self._position:
+                            self._capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                            self._position = keyframe
+                            self._seeks += 1
+                        while self._position < index:
+                            if not self._capture.grab():
+                                break
+                            self._position += 1
+                            self._grabs += 1
+                    success, frame = self._capture.read()
+                    if not success:
+                        self._position = -1
+                        raise ModulesPackage.VideoStoreError(f"Could not decode frame {index}")
+                    self._position += 1
+                    self._reads += 1
+                    return frame
+
+            def frames(self, start=0):
+                """Yields frames in order from start without holding more than one in memory"""
+                for index in range(start, self._header["count"]):
+                    yield self.read_frame(index)
+
+            def debug(self, debug):
+                """Prints out values of all variables for debugging"""
+                if debug:
+                    print("target_dir: " + str(self._target_dir))
+                    print("header: " + str(self._header))
+                    print("keyframes: " + str(self._keyframes))
+                    print("stats: " + str(self.get_stats()))
+
+            def get_stats(self):
+                """Returns counts of seeks, frames skipped over and frames decoded"""
+                return {"seeks": self._seeks, "grabs": self._grabs, "reads": self._reads}
+
+            def get_keyframes(self):
+                """Returns the positions of the keyframes"""
+                return self._keyframes
+
+        class Recorder:
+            """Encodes and writes frames as 'text<N>.ext' images on background threads so the
+            capture loop only pays for queueing them"""
+            def __init__(self, target_dir, text="img", ext=".jpg", workers=2, max_queue=64,
+                         overflow=None, quality=None, png_compression=None, copy_frames=True):
+                self._target_dir = target_dir
+                self._text = text
+                self._ext = ext
+                self._max_queue = max_queue
+                self._overflow = overflow or ModulesPackage.RECORDER_OVERFLOW_BLOCK
+                self._copy_frames = copy_frames
+                self._params = []
+                if quality is not None:
+                    if ext.lower() in (".jpg", ".jpeg"):
+                        self._params += [cv2.IMWRITE_JPEG_QUALITY, quality]
+                    elif ext.lower() == ".webp":
+                        self._params += [cv2.IMWRITE_WEBP_QUALITY, quality]
+                if png_compression is not None and ext.lower() == ".png":
+                    self._params += [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+                self._queue = collections.deque()
+                self._condition = threading.Condition()
+                self._threads = [threading.Thread(target=self._work, daemon=True,
+                                                  name="RecorderWriter" + str(i))
+                                 for i in range(workers)]
+                self._closed = False
+                self._next_num = 0
+                self._written = 0
+                self._dropped = 0
+                self._max_depth = 0
+                self._errors = []
+
+                if self._overflow not in (ModulesPackage.RECORDER_OVERFLOW_BLOCK,
+                                          ModulesPackage.RECORDER_OVERFLOW_DROP_OLDEST):
+                    raise ModulesPackage.RecorderError(f"Unknown overflow policy {overflow}")
+
+            def start(self):
+                """Starts the writer threads"""
+                os.makedirs(self._target_dir, exist_ok=True)
+                for thread in self._threads:
+                    thread.start()
+                return self
+
+            def write(self, frame):
+                """Queues a frame to be written as the next numbered image and returns its
+                number"""
+                if self._copy_frames:
+                    frame = frame.copy()
+                with self._condition:
+                    if self._closed:
+                        raise ModulesPackage.RecorderError("Recorder is closed")
+                    if len(self._queue) >= self._max_queue:
+                        if self._overflow == ModulesPackage.RECORDER_OVERFLOW_DROP_OLDEST:
+                            self._queue.popleft()
+                            self._dropped += 1
+                        else:
+                            while len(self._queue) >= self._max_queue:
+                                self._condition.wait()
+                    num = self._next_num
+                    self._next_num += 1
+                    self._queue.append((num, frame))
+                    self._max_depth = max(self._max_depth, len(self._queue))
+                    self._condition.notify_all()
+                return num
+
+            def _work(self):
+                """Writer thread loop that encodes queued frames until closed"""
+                while True:
+                    with self._condition:
+                        while not self._queue and not self._closed:
+                            self._condition.wait()
+                        if not self._queue:
+                            return
+                        num, frame = self._queue.popleft()
+                        self._condition.notify_all()
+                    try:
+                        self._write_image(num, frame)
+                    except Exception as error:  # pylint: disable=broad-except
+                        with self._condition:
+                            self._errors.append(error)
+                    else:
+                        with self._condition:
+                            self._written += 1
+
+            def _write_image(self, num, frame):
+                """Encodes one frame and renames it into place once it is complete"""
+                name = self._text + str(num) + self._ext
+                success, buffer = cv2.imencode(self._ext, frame, self._params)
+                if not success:
+                    raise ModulesPackage.RecorderError(f"Could not encode image {name}")
+                tmp_path = os.path.join(self._target_dir, "." + name + ".tmp")
+                try:
+                    with open(tmp_path, "wb") as image_file:
+                        image_file.write(buffer.data)
+                    os.replace(tmp_path, os.path.join(self._target_dir, name))
+                except OSError:
+                    # Leave no partial file behind, for example when the disk is full
+                    try:
+                        os.remove(tmp_path)
+                    except FileNotFoundError:
+                        pass
+                    raise
+
+            def close(self):
+                """Writes the remaining queued frames and stops the writer threads"""
+                with self._condition:
+                    self._closed = True
+                    self._condition.notify_all()
+                for thread in self._threads:
+                    if thread.is_alive():
+                        thread.join()
+                if self._errors:
+                    raise ModulesPackage.RecorderError(f"{len(self._errors)} frames failed to "
+                                                       f"write, first error: {self._errors[0]}")
+
+            def debug(self, debug):
+                """Prints out values of all variables for debugging"""
+                if debug:
+                    print("target_dir: " + str(self._target_dir))
+                    print("overflow: " + str(self._overflow))
+                    print("stats: " + str(self.get_stats()))
+
+            def get_stats(self):
+                """Returns queue depth, peak queue depth, written, dropped and failed frame
+                counts"""
+                with self._condition:
+                    return {"queue_depth": len(self._queue), "max_queue_depth": self._max_depth,
+                            "written": self._written, "dropped": self._dropped,
+                            "errors": len(self._errors)}
+
+            def get_queue_depth(self):
+                """Returns number of frames waiting to be written"""
+                return len(self._queue)
+
+            def get_dropped(self):
+                """Returns number of frames dropped because the queue was full"""
+                return self._dropped
+
+            def get_target_dir(self):
+                """Returns the directory the images are written to"""
+                return self._target_dir
+
     class Fps:
-        """Computes Fps over a series of frames and their times"""
-        def __init__(self):
+        """Computes Fps over a series of frames and their times using constant memory: a ring
+        buffer of the last window frames plus streaming estimators over the whole run"""
+        def __init__(self, window=120, ewma_alpha=0.1, discard_first=True):
             self._timer = ModulesPackage.Timer()
-            self._elapsed_times = np.array([])
+            self._window = window
+            self._elapsed_times = np.zeros(window)
+            self._window_sum = 0.0
+            self._count = 0
+            self._discard_first = discard_first
+            self._ewma_alpha = ewma_alpha
+            self._ewma = None
+            self._min = float("inf")
+            self._max = float("-inf")
+            self._last = None
+            self._quantiles = {"p50": self._Quantile(0.5), "p95": self._Quantile(0.95),
+                               "p99": self._Quantile(0.99)}
             self._ms_to_seconds = 1.0/1000000.0
             self._mean = None
             self._fps = None
@@ -249,14 +1384,57 @@ class ModulesPackage:
         def close_timer(self):
             """Stops timer that determines the elapsed time"""
             self._timer.stop()
-            self._elapsed_times = np.append(self._elapsed_times, self._timer.get_elapsed_time())
-            return self._elapsed_times[-1]
+            elapsed_time = self._timer.get_elapsed_time()
+            self.add(elapsed_time)
+            return elapsed_time
+
+        def add(self, elapsed_time):
+            """Records the elapsed time of a frame in constant time and memory, skipping the
+            first frame which usually includes warm up"""
+            self._last = elapsed_time
+            if self._discard_first:
+                self._discard_first = False
+                return
+            slot = self._count % self._window
+            if self._count >= self._window:
+                self._window_sum -= self._elapsed_times.item(slot)
+            self._elapsed_times[slot] = elapsed_time
+            self._window_sum += elapsed_time
+            self._count += 1
+            if slot == self._window - 1:
+                # Resum once per window so float error from subtracting cannot build up
+                self._window_sum = float(self._elapsed_times.sum())
+
+            if self._ewma is None:
+                self._ewma = elapsed_time
+            else:
+                self._ewma += self._ewma_alpha*(elapsed_time - self._ewma)
+            if elapsed_time < self._min:
+                self._min = elapsed_time
+            if elapsed_time > self._max:
+                self._max = elapsed_time
+            for quantile in self._quantiles.values():
+                quantile.add(elapsed_time)
 
         def calculate(self):
-            """Calculates the fps based upon a series of stats"""
-            self._elapsed_times = np.delete(self._elapsed_times, [0])
-            self._mean = np.mean(self._elapsed_times)
-            self._fps = 1.0/self._mean
+            """Calculates the fps from the mean elapsed time of the last window frames"""
+            if self._count:
+                self._mean = self._window_sum/min(self._count, self._window)
+                self._fps = 1.0/self._mean
+
+        def stats(self):
+            """Returns a dictionary of frame time and fps statistics, where mean is over the
+            last window frames, ewma is exponentially weighted and the rest cover the whole
+            run"""
+            self.calculate()
+            stats = {"count": self._count, "last": self._last, "mean": self._mean,
+                     "fps": self._fps, "ewma": self._ewma,
+                     "ewma_fps": 1.0/self._ewma if self._ewma else None,
+                     "min": self._min if self._count else None,
+                     "max": self._max if self._count else None}
+            for name, quantile in self._quantiles.items():
+                stats[name] = quantile.get()
+            return stats
 
         def print_fps(self):
             """Prints out just fps"""
@@ -265,11 +1443,84 @@ class ModulesPackage:
         def debug(self, debug):
             """Prints out values of all variables for debugging"""
             if debug:
-                print("elapsedTimes: " + str(self._elapsed_times))
+                print("elapsedTimes: " + str(self.get_elapsed_times()))
                 print("mean: " + str(self._mean))
                 print("fps: " + str(self._fps))
+                print("stats: " + str(self.stats()))
                 self._timer.debug(debug)
 
+        def get_elapsed_times(self):
+            """Returns a copy of the elapsed times in the window from oldest to newest"""
+            if self._count < self._window:
+                return self._elapsed_times[:self._count].copy()
+            return np.roll(self._elapsed_times, -(self._count % self._window))
+
+        class _Quantile:
+            """Estimates a quantile of a stream in constant memory with the P-squared
+            algorithm"""
+            def __init__(self, quantile):
+                self._quantile = quantile
+                self._heights = []
+                self._positions = [1, 2, 3, 4, 5]
+                self._desired = [1, 1 + 2*quantile, 1 + 4*quantile, 3 + 2*quantile, 5]
+                self._increments = [0, quantile/2, quantile, (1 + quantile)/2, 1]
+                self._count = 0
+
+            def add(self, value):
+                """Updates the marker heights with a new observation"""
+                self._count += 1
+                heights = self._heights
+                if self._count <= 5:
+                    heights.append(value)
+                    heights.sort()
+                    return
+
+                positions = self._positions
+                if value < heights[0]:
+                    heights[0] = value
+                    cell = 0
+                elif value >= heights[4]:
+                    heights[4] = value
+                    cell = 3
+                else:
+                    cell = 0
+                    while value >= heights[cell + 1]:
+                        cell += 1
+                for i in range(cell + 1, 5):
+                    positions[i] += 1
+                for i in range(5):
+                    self._desired[i] += self._increments[i]
+
+                for i in range(1, 4):
+                    offset = self._desired[i] - positions[i]
+                    if ((offset >= 1 and positions[i + 1] - positions[i] > 1) or
+                            (offset <= -1 and positions[i - 1] - positions[i] < -1)):
+                        step = 1 if offset > 0 else -1
+                        height = self._parabolic(i, step)
+                        if not heights[i - 1] < height < heights[i + 1]:
+                            height = heights[i] + step*(heights[i + step] - heights[i]) / \
+                                (positions[i + step] - positions[i])
+                        heights[i] = height
+                        positions[i] += step
+
+            def _parabolic(self, i, step):
+                """Returns the piecewise parabolic prediction for moving marker i by step"""
+                heights = self._heights
+                positions = self._positions
+                return heights[i] + step/(positions[i + 1] - positions[i - 1]) * (
+                    (positions[i] - positions[i - 1] + step)*(heights[i + 1] - heights[i]) /
+                    (positions[i + 1] - positions[i]) +
+                    (positions[i + 1] - positions[i] - step)*(heights[i] - heights[i - 1]) /
+                    (positions[i] - positions[i - 1]))
+
+            def get(self):
+                """Returns the current estimate or None before any observations"""
+                if not self._count:
+                    return None
+                if self._count <= 5:
+                    return self._heights[int(round((self._count - 1)*self._quantile))]
+                return self._heights[2]
+
         def get_fps(self):
             """Returns fps"""
             return self._fps
@@ -292,24 +1543,316 @@ class ModulesPackage:
 
     class Frame:
         """Keeps track of all data regarding the video stream"""
-        def __init__(self, name):
-            self._width = 640
-            self._height = 480
-            self._camera = PiVideoStream(resolution=(self._width, self._height)).start()
-            time.sleep(2.0)
+        def __init__(self, name, resolution=(640, 480), framerate=32, buffer_size=4,
+                     ready_timeout=5.0, backend=None):
+            if buffer_size < 3:
+                raise ModulesPackage.FrameError(f"buffer_size must be at least 3 to hold the "
+                                                f"captured, latest and next frames, not "
+                                                f"{buffer_size}")
+            if backend is None:
+                backend = self.PiCameraBackend(resolution, framerate)
+            self._camera = backend.start()
+            self._width, self._height = self._camera.get_resolution()
+            self._framerate = self._camera.get_framerate()
             self._name = name
             self._frame = np.array([])
+            self._sequence = -1
+            self._timestamp = None
+            self._dropped = 0
+            self._buffer_size = buffer_size
+            self._buffer = np.empty((buffer_size, self._height, self._width, 3), dtype=np.uint8)
+            self._timestamps = np.zeros(buffer_size)
+            self._latest_sequence = -1
+            self._latest_slot = -1
+            self._held_slot = -1
+            self._finished = False
+            self._error = None
+            self._condition = threading.Condition()
+            self._running = True
+            self._thread = threading.Thread(target=self._grab, daemon=True, name="FrameGrabber")
+            self._thread.start()
+
+            if not self.wait_until_ready(ready_timeout):
+                self.stop()
+                if self._error is not None:
+                    raise ModulesPackage.FrameError(f"Camera failed: {self._error!r}") \
+                        from self._error
+                raise ModulesPackage.FrameError(f"Camera produced no frame within "
+                                                f"{ready_timeout} seconds")
+
+        def _grab(self):
+            """Grabber thread loop that reads each new camera frame into the ring buffer,
+            skipping the latest slot and the slot last returned by capture_frame"""
+            buffer = self._buffer
+            try:
+                while self._running:
+                    sequence = self._latest_sequence + 1
+                    with self._condition:
+                        slot = (self._latest_slot + 1) % self._buffer_size
+                        if slot == self._held_slot:
+                            slot = (slot + 1) % self._buffer_size
+                    frame = self._camera.read(buffer[slot])
+                    if frame is None:
+                        break
+                    if not np.may_share_memory(frame, buffer[slot]):
+                        if frame.shape != buffer.shape[1:]:
+                            # Swapped in below under the lock, the held frame keeps viewing
+                            # the old buffer
+                            buffer = np.empty((self._buffer_size,) + frame.shape,
+                                              dtype=frame.dtype)
+                        np.copyto(buffer[slot], frame)
+                    self._timestamps[slot] = time.monotonic()
+                    with self._condition:
+                        self._buffer = buffer
+                        self._latest_sequence = sequence
+                        self._latest_slot = slot
+                        self._condition.notify_all()
+            except Exception as error:  # pylint: disable=broad-except
+                self._error = error
+            finally:
+                with self._condition:
+                    self._finished = True
+                    self._condition.notify_all()
+
+        def wait_until_ready(self, timeout=None):
+            """Blocks until the camera has produced its first frame and returns whether it did"""
+            with self._condition:
+                return self._condition.wait_for(
+                    lambda: self._latest_sequence >= 0 or self._finished, timeout) and \
+                    self._latest_sequence >= 0
+
+        def capture_frame(self, timeout=None):
+            """Waits for a frame newer than the last captured one and returns it, or None if
+            the timeout ran out or the source is exhausted, and raises the error the camera
+            failed with once its frames are used up. The frame is a view of a ring buffer
+            slot which the grabber leaves alone until the next call, so copy it if it must be
+            kept longer"""
+            with self._condition:
+                if not self._condition.wait_for(
+                        lambda: self._latest_sequence > self._sequence or self._finished,
+                        timeout) or self._latest_sequence <= self._sequence:
+                    if self._finished and self._error is not None:
+                        raise self._error
+                    return None
+                sequence = self._latest_sequence
+                slot = self._latest_slot
+                self._held_slot = slot
+                self._frame = self._buffer[slot]
+            if self._sequence >= 0:
+                self._dropped += sequence - self._sequence - 1
+            self._sequence = sequence
+            self._timestamp = self._timestamps[slot]
+            return self._frame
+
+        def stop(self):
+            """Stops the grabber thread and the video stream"""
+            self._running = False
+            # Wakes backends that wait in read() for a frame that may never come
+            self._camera.request_stop()
+            if self._thread.is_alive() and self._thread is not threading.current_thread():
+                self._thread.join()
+            self._camera.stop()
+
+        def is_finished(self):
+            """Returns whether the source has run out of frames"""
+            return self._finished
+
+        class Backend(abc.ABC):
+            """Interface for sources of frames used by Frame"""
+            def __init__(self, resolution, framerate):
+                self._width, self._height = resolution
+                self._framerate = framerate
+                self._next_deadline = None
+                self._stop_event = threading.Event()
+
+            def start(self):
+                """Opens the source and returns itself"""
+                return self
+
+            def request_stop(self):
+                """Asks a read that is waiting for a frame to give up and return None, called
+                from another thread before stop"""
+                self._stop_event.set()
+
+            @abc.abstractmethod
+            def read(self, out):
+                """Blocks until the next frame, writing it into out when possible, and returns
+                it or None when the source is exhausted"""
+
+            def stop(self):
+                """Releases the source"""
+
+            def _pace(self):
+                """Sleeps until the next frame is due or a stop is requested so reads happen at
+                the framerate"""
+                if not self._framerate:
+                    return
+                now = time.perf_counter()
+                if self._next_deadline is None or self._next_deadline < now:
+                    self._next_deadline = now
+                else:
+                    self._stop_event.wait(self._next_deadline - now)
+                self._next_deadline += 1.0/self._framerate
+
+            def get_resolution(self):
+                """Returns (width, height) of the frames"""
+                return self._width, self._height
+
+            def get_framerate(self):
+                """Returns framerate of the source"""
+                return self._framerate
+
+        class PiCameraBackend(Backend):
+            """Reads frames from the Raspberry Pi camera through imutils' PiVideoStream"""
+            def __init__(self, resolution=(640, 480), framerate=32):
+                super().__init__(resolution, framerate)
+                self._stream = None
+                self._last_frame = None
+
+            def start(self):
+                """Imports picamera dependent code and starts the video stream thread"""
+                from imutils.video.pivideostream import PiVideoStream
+                self._stream = PiVideoStream(resolution=(self._width, self._height),
+                                             framerate=self._framerate).start()
+                return self
+
+            def read(self, out):
+                """Waits for the stream thread to replace its frame and returns the new one"""
+                frame = self._stream.read()
+                while frame is None or frame is self._last_frame:
+                    if self._stream.stopped or self._stop_event.is_set():
+                        return None
+                    time.sleep(0.001)
+                    frame = self._stream.read()
+                self._last_frame = frame
+                return frame
+
+            def stop(self):
+                """Stops the video stream thread"""
+                self._stream.stop()
+
+            def get_stream(self):
+                """Returns the PiVideoStream object"""
+                return self._stream
+
+        class VideoCaptureBackend(Backend):
+            """Reads frames from a cv2.VideoCapture device index, file or url"""
+            def __init__(self, source=0, resolution=(640, 480), framerate=None):
+                super().__init__(resolution, framerate)
+                self._source = source
+                self._capture = None
+
+            def start(self):
+                """Opens the capture and applies the requested resolution and framerate"""
+                self._capture = cv2.VideoCapture(self._source)
+                if not self._capture.isOpened():
+                    raise ModulesPackage.FrameError(f"Could not open video source "
+                                                    f"{self._source}")
+                if isinstance(self._source, int):
+                    self._capture.set(cv2.CAP_PROP_FRAME_WIDTH, self._width)
+                    self._capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self._height)
+                    if self._framerate:
+                        self._capture.set(cv2.CAP_PROP_FPS, self._framerate)
+                self._width = int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+                self._height = int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                self._framerate = self._capture.get(cv2.CAP_PROP_FPS) or self._framerate
+                return self
+
+            def read(self, out):
+                """Decodes the next frame directly into out"""
+                success, frame = self._capture.read(out)
+                return frame if success else None
+
+            def stop(self):
+                """Releases the capture"""
+                self._capture.release()
+
+        class ReplayBackend(Backend):
+            """Replays a ReadDir style 'text<N>.ext' directory or a frame store at a fixed
+            framerate"""
+            def __init__(self, target_dir, framerate=30, loop=False):
+                super().__init__((0, 0), framerate)
+                self._target_dir = target_dir
+                self._loop = loop
+                self._read_dir = None
+                self._frames = None
+                self._img_num = 0
 
-        def capture_frame(self):
-            """Reads the frame from the video stream"""
-            self._frame = self._camera.read()
+            def start(self):
+                """Opens the directory or store as an unlabeled lazy ReadDir and reads the first
+                frame to find the resolution"""
+                self._read_dir = ModulesPackage.DirectoryManagement.ReadDir(
+                    self._target_dir, ModulesPackage.READDIR_SLIDESHOW_MODE_DELAY, lazy=True,
+                    cache_bytes=0, label_images=False)
+                self._read_dir.read()
+                self._frames = self._read_dir.get_images()
+                if not len(self._frames):
+                    raise ModulesPackage.FrameError(f"No frames in {self._target_dir}")
+                self._height, self._width = self._get_frame(0).shape[:2]
+                return self
+
+            def read(self, out):
+                """Returns the next frame once it is due"""
+                if self._img_num >= len(self._frames):
+                    if not self._loop:
+                        return None
+                    self._img_num = 0
+                self._pace()
+                frame = self._get_frame(self._img_num)
+                self._img_num += 1
+                return frame
+
+            def _get_frame(self, img_num):
+                """Returns a frame, raising FrameError if it could not be decoded"""
+                try:
+                    return self._frames[img_num]
+                except ModulesPackage.ReadDirError as error:
+                    raise ModulesPackage.FrameError(str(error)) from error
+
+            def stop(self):
+                """Closes the directory"""
+                if self._read_dir is not None:
+                    self._read_dir.close()
+
+        class SyntheticBackend(Backend):
+            """Generates deterministic frames of colored circles bouncing around a background"""
+            def __init__(self, resolution=(640, 480), framerate=30, blobs=3, radius=20,
+                         colors=None, background=(0, 0, 0), num_frames=None, seed=0):
+                super().__init__(resolution, framerate)
+                rng = np.random.default_rng(seed)
+                self._radius = radius
+                self._background = background
+                self._num_frames = num_frames
+                self._start = rng.uniform(0, [self._width, self._height], size=(blobs, 2))
+                self._velocity = rng.uniform(-1, 1, size=(blobs, 2)) * [self._width,
+                                                                        self._height] / 60.0
+                self._colors = colors or [tuple(int(c) for c in rng.integers(0, 256, 3))
+                                          for _ in range(blobs)]
+                self._img_num = 0
+
+            def read(self, out):
+                """Draws the next frame into out once it is due"""
+                if self._num_frames is not None and self._img_num >= self._num_frames:
+                    return None
+                self._pace()
+                out[:] = self._background
+                for center, color in zip(self.get_centers(self._img_num), self._colors):
+                    cv2.circle(out, (int(center[0]), int(center[1])), self._radius, color, -1)
+                self._img_num += 1
+                return out
+
+            def get_centers(self, img_num):
+                """Returns the circle centers of a frame, reflecting them off the edges"""
+                size = np.array([self._width, self._height], dtype=float)
+                position = np.mod(self._start + self._velocity*img_num, 2*size)
+                return np.where(position > size, 2*size - position, position)
 
         def preprocessing(self):
             """Preprocesses the frame"""
 
         def imshow(self):
             """Displays the frame"""
-            cv2.imshow(self._name, self._frame)
+            ModulesPackage.Display.get_default().show(self._name, self._frame)
 
         def update(self):
             """Checks certain break conditions and updates certain variables"""
@@ -319,7 +1862,7 @@ class ModulesPackage:
             return self._name
 
         def get_camera(self):
-            """Returns video stream object"""
+            """Returns camera backend object"""
             return self._camera
 
         def get_width(self):
@@ -330,14 +1873,192 @@ class ModulesPackage:
             """Returns raw height of frame"""
             return self._height
 
+        def get_framerate(self):
+            """Returns requested framerate of the video stream"""
+            return self._framerate
+
+        def get_frame(self):
+            """Returns the last captured frame"""
+            return self._frame
+
+        def get_sequence(self):
+            """Returns sequence number of the last captured frame"""
+            return self._sequence
+
+        def get_timestamp(self):
+            """Returns time.monotonic() capture time of the last captured frame"""
+            return self._timestamp
+
+        def get_dropped(self):
+            """Returns number of frames that were skipped because capture_frame fell behind"""
+            return self._dropped
+
+    class Display:
+        """Shows frames in named windows inline with cv2.imshow, from a dedicated thread
+        capped at a refresh rate that only keeps the latest frame of each window, or not at
+        all when headless"""
+        _default = None
+
+        def __init__(self, mode=None, rate=15.0):
+            self._mode = mode or ModulesPackage.DISPLAY_MODE_INLINE
+            self._rate = rate
+            self._windows = {}
+            self._lock = threading.Lock()
+            self._thread = None
+            self._running = False
+            self._quit_requested = False
+            self._last_key = None
+            self._rendered = 0
+            self._skipped = 0
+
+        @classmethod
+        def get_default(cls):
+            """Returns the display used by Frame.imshow, ReadDir.imshow and
+            check_for_quit_request, which is inline unless replaced with set_default"""
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+        @classmethod
+        def set_default(cls, display):
+            """Replaces the default display, starting it, and returns it"""
+            if cls._default is not None and cls._default is not display:
+                cls._default.close()
+            cls._default = display.start()
+            return display
+
+        def start(self):
+            """Starts the render thread in threaded mode"""
+            if self._mode == ModulesPackage.DISPLAY_MODE_THREADED and self._thread is None:
+                self._running = True
+                self._thread = threading.Thread(target=self._render, daemon=True,
+                                                name="DisplayRender")
+                self._thread.start()
+            return self
+
+        def show(self, window_name, frame):
+            """Displays a frame, or in threaded mode copies it into the window's free buffer
+            for the render thread to pick up"""
+            if self._mode == ModulesPackage.DISPLAY_MODE_HEADLESS:
+                return
+            if self._mode == ModulesPackage.DISPLAY_MODE_INLINE:
+                cv2.imshow(window_name, frame)
+                return
+            with self._lock:
+                window = self._windows.get(window_name)
+                if window is None or window.get_shape() != frame.shape:
+                    window = self._windows[window_name] = self._Window(frame)
+                elif window.write(frame):
+                    self._skipped += 1
+
+        def _render(self):
+            """Render thread loop that shows changed windows and polls keys at the rate cap"""
+            period = 1.0/self._rate
+            next_deadline = time.perf_counter()
+            while self._running:
+                with self._lock:
+                    changed = [(name, window) for name, window in self._windows.items()
+                               if window.has_update()]
+                    frames = [(name, window, window.acquire()) for name, window in changed]
+                for name, window, frame in frames:
+                    cv2.imshow(name, frame)
+                    self._rendered += 1
+                with self._lock:
+                    for _, window, _ in frames:
+                        window.release()
+                key = cv2.waitKey(1) & 0xFF
+                if key != 0xFF:
+                    self._last_key = key
+                    if key == ord('q'):
+                        self._quit_requested = True
+
+                next_deadline += period
+                delay = next_deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_deadline = time.perf_counter()
+            cv2.destroyAllWindows()
+
+        def close(self):
+            """Stops the render thread, which closes its windows"""
+            self._running = False
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+        def is_quit_requested(self):
+            """Returns whether 'q' was pressed in a window shown by the render thread"""
+            return self._quit_requested
+
+        def debug(self, debug):
+            """Prints out values of all variables for debugging"""
+            if debug:
+                print("mode: " + str(self._mode))
+                print("rate: " + str(self._rate))
+                print("windows: " + str(list(self._windows)))
+                print("rendered: " + str(self._rendered))
+                print("skipped: " + str(self._skipped))
+
+        def get_mode(self):
+            """Returns mode of the display"""
+            return self._mode
+
+        def get_last_key(self):
+            """Returns code of the last key the render thread saw or None"""
+            return self._last_key
+
+        def get_stats(self):
+            """Returns number of frames rendered and frames replaced before being rendered"""
+            return {"rendered": self._rendered, "skipped": self._skipped}
+
+        class _Window:
+            """Triple buffer of one window so the producer never waits for or overwrites the
+            frame being rendered"""
+            def __init__(self, frame):
+                self._buffers = [frame.copy(), np.empty_like(frame), np.empty_like(frame)]
+                self._latest = 0
+                self._rendering = None
+                self._version = 1
+                self._rendered_version = 0
+
+            def write(self, frame):
+                """Copies a frame into a buffer that is neither latest nor being rendered and
+                returns whether it replaced a frame that was never rendered"""
+                index = next(i for i in range(3) if i not in (self._latest, self._rendering))
+                np.copyto(self._buffers[index], frame)
+                skipped = self.has_update()
+                self._latest = index
+                self._version += 1
+                return skipped
+
+            def has_update(self):
+                """Returns whether the latest frame has not been rendered yet"""
+                return self._version != self._rendered_version
+
+            def acquire(self):
+                """Marks the latest frame as being rendered and returns it"""
+                self._rendering = self._latest
+                self._rendered_version = self._version
+                return self._buffers[self._rendering]
+
+            def release(self):
+                """Marks rendering as finished"""
+                self._rendering = None
+
+            def get_shape(self):
+                """Returns shape of the frames"""
+                return self._buffers[0].shape
+
     class Keyboard:
         """Wraps pynput keyboard class and embeds event queue for accesing and organizing key
         events"""
-        def __init__(self, len_event_buffers=64):
-            self._listener = pynput.keyboard.Listener(on_press=self._on_press,
-                                                      on_release=self._on_release)
-            self._events = queue.Queue(maxsize=len_event_buffers)
-            self._keys = {key_name: self._Key(key_name) for key_name in self.get_key_names()}
+        def __init__(self, len_event_buffers=64, overflow=None, tap_duration=0.15):
+            self._listener = None
+            self._events = self._EventBus(len_event_buffers,
+                                          overflow or ModulesPackage.KEYBOARD_OVERFLOW_DROP_OLDEST)
+            self._tap_duration = tap_duration
+            self._keys = {}
 
         def _on_press(self, key):
             """Callback for when key is pressed"""
@@ -348,45 +2069,163 @@ class ModulesPackage:
             self._produce(ModulesPackage.KEYBOARD_RELEASED_STATE, key)
 
         def start(self):
-            """Starts listening to the keyboard"""
+            """Starts listening to the keyboard, which is when pynput first connects to the
+            display or input backend"""
+            self._listener = pynput.keyboard.Listener(on_press=self._on_press,
+                                                      on_release=self._on_release)
             self._listener.start()
 
         def stop(self):
             """Stops listening to the keyboard"""
-            self._listener.stop()
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
 
         def _produce(self, state, key):
-            """Produces key into events queue"""
+            """Replaces the key's state snapshot and produces it into events queue, merging
+            auto repeated presses"""
             key_name = self._Key.name(key)
-            self._keys[key_name].set_state(state)
-            self._events.put(self._keys[key_name], block=False)
+            if key_name is None:
+                return
+            timestamp = time.monotonic()
+            previous = self._keys.get(key_name)
+            repeat = (previous is not None and previous.get_state() == state and
+                      state == ModulesPackage.KEYBOARD_PRESSED_STATE)
+            if state == ModulesPackage.KEYBOARD_PRESSED_STATE and not repeat:
+                pressed_time = timestamp
+            else:
+                pressed_time = previous.get_pressed_time() if previous is not None else None
+            event = self._Key(key_name, state, timestamp, pressed_time, self._tap_duration)
+            self._keys[key_name] = event
+            self._events.put(event, coalesce=repeat)
 
         def consume(self):
             """Consumes keys in the events queue"""
 
         @staticmethod
+        @functools.lru_cache(maxsize=None)
         def get_key_names():
-            """Returns string list of all key names including both special keys and letter keys"""
-            key_data = list(pynput.keyboard.Key.__dict__.values())
+            """Returns string list of all key names including both special keys and letter keys,
+            built once and shared as a read only array"""
             key_names = np.array([])
-            for data in key_data:
+            for data in pynput.keyboard.Key.__dict__.values():
                 if isinstance(data, list):
-                    special_keys = np.array(data)
-                    lowercase_alphabet = np.array(list(string.ascii_lowercase),
-                                                  dtype=special_keys.dtype)
-                    key_names = np.concatenate((special_keys, lowercase_alphabet))
+                    key_names = np.array(list(data) + list(string.ascii_lowercase))
                     break
+            key_names.flags.writeable = False
             return key_names
 
         def get_events(self):
             """Returns events queue"""
             return self._events
 
+        def get_key_state(self, key_name):
+            """Returns the latest state snapshot of a key without touching the events queue"""
+            key = self._keys.get(key_name)
+            if key is None:
+                key = self._Key(key_name, tap_duration=self._tap_duration)
+            return key
+
+        def get_snapshot(self):
+            """Returns a dictionary of the latest state snapshot of every key seen so far"""
+            return dict(self._keys)
+
+        def is_pressed(self, key_name):
+            """Returns whether a key is currently pressed"""
+            return self.get_key_state(key_name).get_state() == \
+                ModulesPackage.KEYBOARD_PRESSED_STATE
+
+        class _EventBus:
+            """Bounded queue of immutable key events that merges auto repeats and never blocks
+            or raises on the listener thread when full"""
+            def __init__(self, maxsize, overflow):
+                self._maxsize = maxsize
+                self._overflow = overflow
+                self._events = collections.deque()
+                self._lock = threading.Lock()
+                self._not_empty = threading.Condition(self._lock)
+                self._dropped = 0
+                self._coalesced = 0
+                self._listeners = []
+
+            def add_listener(self, callback):
+                """Calls callback with every event on the listener thread as it is produced"""
+                self._listeners = self._listeners + [callback]
+
+            def remove_listener(self, callback):
+                """Stops calling a callback added with add_listener"""
+                self._listeners = [listener for listener in self._listeners
+                                   if listener is not callback]
+
+            def put(self, event, coalesce=False):
+                """Adds an event, replacing the newest one instead if both are presses of the
+                same key, and applies the overflow policy when full"""
+                for listener in self._listeners:
+                    listener(event)
+                with self._lock:
+                    if coalesce and self._events:
+                        newest = self._events[-1]
+                        if (newest.get_name() == event.get_name() and
+                                newest.get_state() == event.get_state()):
+                            self._events[-1] = event
+                            self._coalesced += 1
+                            return
+                    if len(self._events) >= self._maxsize:
+                        self._dropped += 1
+                        if self._overflow == ModulesPackage.KEYBOARD_OVERFLOW_DROP_NEWEST:
+                            return
+                        self._events.popleft()
+                    self._events.append(event)
+                    self._not_empty.notify()
+
+            def get(self, block=True, timeout=None):
+                """Removes and returns the oldest event, waiting like queue.Queue.get for one
+                if block is set and raising queue.Empty if there is none"""
+                with self._not_empty:
+                    if block and not self._not_empty.wait_for(lambda: self._events, timeout):
+                        raise queue.Empty
+                    if not self._events:
+                        raise queue.Empty
+                    return self._events.popleft()
+
+            def get_nowait(self):
+                """Removes and returns the oldest event without waiting"""
+                return self.get(block=False)
+
+            def drain(self):
+                """Removes and returns all events from oldest to newest"""
+                with self._lock:
+                    events = list(self._events)
+                    self._events.clear()
+                    return events
+
+            def empty(self):
+                """Returns whether there are no events"""
+                return not self._events
+
+            def qsize(self):
+                """Returns number of events waiting"""
+                return len(self._events)
+
+            def get_dropped(self):
+                """Returns number of events dropped by the overflow policy"""
+                return self._dropped
+
+            def get_coalesced(self):
+                """Returns number of auto repeat events merged into a previous one"""
+                return self._coalesced
+
         class _Key:
-            def __init__(self, name):
-                self._state = False
+            """Immutable snapshot of a key's state at the time of an event"""
+            __slots__ = ("_name", "_state", "_timestamp", "_pressed_time", "_tap_duration")
+
+            def __init__(self, name, state=False, timestamp=None, pressed_time=None,
+                         tap_duration=0.15):
                 self._name = name
-                self._timer = ModulesPackage.Timer()
+                self._state = state
+                self._timestamp = timestamp
+                self._pressed_time = pressed_time
+                self._tap_duration = tap_duration
 
             @staticmethod
             def name(key):
@@ -396,34 +2235,28 @@ class ModulesPackage:
                 except AttributeError:
                     return key.char
 
-            def set_state(self, state):
-                """Sets the state of the key and start and stop the timer"""
-                if self._state != state:
-                    self._state = state
-                    if self._state == ModulesPackage.KEYBOARD_PRESSED_STATE:
-                        self._timer.start()
-                    elif self._state == ModulesPackage.KEYBOARD_RELEASED_STATE:
-                        self._timer.stop()
-
             def debug(self, debug):
                 """Prints out all stored data for debugging"""
                 if debug:
                     print("state: ", self._state)
                     print("name: ", self._name)
-                    self._timer.debug(debug)
+                    print("timestamp: ", self._timestamp)
+                    print("pressed_time: ", self._pressed_time)
 
             def get_action_type(self):
                 """Classify key action as 'tap' or 'hold' based on press duration"""
-                tap_duration = 0.15
-                elapsed_time = self.get_elapsed_time()
-                if elapsed_time <= tap_duration:
+                if self.get_elapsed_time() <= self._tap_duration:
                     return ModulesPackage.KEYBOARD_ACTION_TYPE_TAP
                 else:
                     return ModulesPackage.KEYBOARD_ACTION_TYPE_HOLD
 
             def get_elapsed_time(self):
-                """Wraps Timer class' get_elapsed_time method"""
-                return self._timer.get_elapsed_time()
+                """Returns how long the key has been held if pressed or was held if released"""
+                if self._pressed_time is None:
+                    return 0.0
+                if self._state == ModulesPackage.KEYBOARD_PRESSED_STATE:
+                    return time.monotonic() - self._pressed_time
+                return self._timestamp - self._pressed_time
 
             def get_state(self):
                 """Returns state of key"""
@@ -433,6 +2266,14 @@ class ModulesPackage:
                 """Returns name of key"""
                 return self._name
 
+            def get_timestamp(self):
+                """Returns time.monotonic() time of the event"""
+                return self._timestamp
+
+            def get_pressed_time(self):
+                """Returns time.monotonic() time the key was last pressed"""
+                return self._pressed_time
+
     class Timer:
         """Monitors time to provide elapsed time or activate a callback"""
         def __init__(self, callback=None, delay_ms=None):
@@ -492,6 +2333,713 @@ class ModulesPackage:
                 print("delay_ms: ", self._delay_ms)
                 print("callback: ", self._callback)
 
+        def get_callback(self):
+            """Returns the callback activated by update"""
+            return self._callback
+
+        def get_delay_ms(self):
+            """Returns the delay in milliseconds before the callback is activated"""
+            return self._delay_ms
+
+    class AsyncLoop:
+        """Asyncio adapters that let capture, processing and keyboard input overlap in one
+        event loop"""
+        _executor = None
+
+        @classmethod
+        def get_executor(cls):
+            """Returns the thread pool shared by offloaded processing, created on first use"""
+            if cls._executor is None:
+                cls._executor = concurrent.futures.ThreadPoolExecutor(
+                    thread_name_prefix="AsyncLoopWorker")
+            return cls._executor
+
+        @classmethod
+        async def offload(cls, function, *args):
+            """Runs CPU bound work like ColorTracker.processing on the shared thread pool, which
+            overlaps with the loop because OpenCV releases the GIL"""
+            return await asyncio.get_running_loop().run_in_executor(cls.get_executor(),
+                                                                    function, *args)
+
+        @classmethod
+        async def pipeline(cls, frames, function, max_in_flight=2, copy_frames=True):
+            """Yields (frame, result) pairs in capture order while up to max_in_flight frames
+            are processed, copying frames first since a Frame reuses its ring buffer slots"""
+            pending = collections.deque()
+            async for frame in frames:
+                if copy_frames:
+                    frame = frame.copy()
+                pending.append((frame, asyncio.ensure_future(cls.offload(function, frame))))
+                if len(pending) >= max_in_flight:
+                    frame, result = pending.popleft()
+                    yield frame, await result
+            while pending:
+                frame, result = pending.popleft()
+                yield frame, await result
+
+        @staticmethod
+        def quit_requested(keyboard, key_name="q"):
+            """Returns whether the quit key is pressed from the keyboard state snapshot, which
+            unlike check_for_quit_request does not block in cv2.waitKey"""
+            return keyboard.is_pressed(key_name)
+
+        class FrameStream:
+            """Async iterator over new frames of a Frame, waiting for each on a dedicated
+            thread so the event loop keeps running"""
+            def __init__(self, frame, timeout=1.0, copy_frames=False):
+                self._frame = frame
+                self._timeout = timeout
+                self._copy_frames = copy_frames
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="AsyncFrameStream")
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                loop = asyncio.get_running_loop()
+                while True:
+                    image = await loop.run_in_executor(self._executor, self._frame.capture_frame,
+                                                       self._timeout)
+                    if image is not None:
+                        return image.copy() if self._copy_frames else image
+                    if self._frame.is_finished():
+                        self.close()
+                        raise StopAsyncIteration
+
+            def close(self):
+                """Shuts down the waiting thread"""
+                self._executor.shutdown(wait=False)
+
+        class KeyboardStream:
+            """Async iterator over Keyboard events bridged thread safely from the pynput
+            listener thread into the event loop, dropping the oldest when full"""
+            def __init__(self, keyboard, maxsize=64):
+                self._keyboard = keyboard
+                self._loop = asyncio.get_running_loop()
+                self._queue = asyncio.Queue(maxsize=maxsize)
+                self._dropped = 0
+                self._keyboard.get_events().add_listener(self._on_event)
+
+            def _on_event(self, event):
+                """Listener thread callback that hands the event over to the event loop"""
+                try:
+                    self._loop.call_soon_threadsafe(self._put, event)
+                except RuntimeError:
+                    # The event loop was closed without closing this stream
+                    self.close()
+
+            def _put(self, event):
+                """Event loop callback that queues an event"""
+                if self._queue.full():
+                    self._queue.get_nowait()
+                    self._dropped += 1
+                self._queue.put_nowait(event)
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                return await self._queue.get()
+
+            async def get(self):
+                """Waits for and returns the next key event"""
+                return await self._queue.get()
+
+            def close(self):
+                """Stops receiving events from the keyboard"""
+                self._keyboard.get_events().remove_listener(self._on_event)
+
+            def get_dropped(self):
+                """Returns number of events dropped because the consumer fell behind"""
+                return self._dropped
+
+    class TimerScheduler:
+        """Runs the callbacks of many timers from one loop by keeping their deadlines in a
+        min-heap, so checking costs nothing when no timer is due"""
+        def __init__(self):
+            self._heap = []
+            self._counter = itertools.count()
+            self._cancelled = 0
+
+        def schedule(self, callback, delay_ms, periodic=False):
+            """Schedules a callback after delay_ms, repeating every delay_ms if periodic, and
+            returns a handle that can be cancelled"""
+            if delay_ms is None or (periodic and delay_ms <= 0):
+                raise ModulesPackage.TimerError(f"Invalid delay {delay_ms} for scheduled "
+                                                f"callback")
+            entry = self._Entry(self, callback, delay_ms/1000.0 if periodic else None)
+            heapq.heappush(self._heap, (time.perf_counter() + delay_ms/1000.0,
+                                        next(self._counter), entry))
+            return entry
+
+        def add(self, timer, periodic=True):
+            """Schedules the callback and delay of a Timer, checking them once here instead of
+            on every update"""
+            if timer.get_callback() is None:
+                raise ModulesPackage.TimerError("No callback specified. Please specify in "
+                                                "constructor")
+            if timer.get_delay_ms() is None:
+                raise ModulesPackage.TimerError("No delay specified. Please specify in "
+                                                "constructor")
+            return self.schedule(timer.get_callback(), timer.get_delay_ms(), periodic)
+
+        def cancel(self, entry):
+            """Cancels a scheduled callback so it never runs again"""
+            if not entry.is_cancelled():
+                entry.mark_cancelled()
+                self._cancelled += 1
+                if self._cancelled > len(self._heap)//2:
+                    self._heap[:] = [item for item in self._heap if not item[2].is_cancelled()]
+                    heapq.heapify(self._heap)
+                    self._cancelled = 0
+
+        def run_due(self, now=None):
+            """Runs every callback whose deadline has passed and returns how many ran"""
+            heap = self._heap
+            if now is None:
+                now = time.perf_counter()
+            if not heap or heap[0][0] > now:
+                return 0
+            fired = 0
+            while heap and heap[0][0] <= now:
+                deadline, _, entry = heapq.heappop(heap)
+                if entry.is_cancelled():
+                    self._cancelled -= 1
+                    continue
+                period = entry.get_period()
+                if period is not None:
+                    # Skip missed periods instead of firing a burst to catch up
+                    deadline += period*(int((now - deadline)/period) + 1)
+                    heapq.heappush(heap, (deadline, next(self._counter), entry))
+                else:
+                    entry.mark_cancelled()
+                entry.get_callback()()
+                fired += 1
+            return fired
+
+        def time_until_next(self, now=None):
+            """Returns seconds until the next deadline, 0 if one is due, or None if nothing is
+            scheduled"""
+            heap = self._heap
+            while heap and heap[0][2].is_cancelled():
+                heapq.heappop(heap)
+                self._cancelled -= 1
+            if not heap:
+                return None
+            if now is None:
+                now = time.perf_counter()
+            return max(heap[0][0] - now, 0.0)
+
+        def sleep_until_next(self, max_sleep=None):
+            """Sleeps until the next deadline, but no longer than max_sleep seconds"""
+            delay = self.time_until_next()
+            if delay is None:
+                delay = max_sleep
+            elif max_sleep is not None:
+                delay = min(delay, max_sleep)
+            if delay:
+                time.sleep(delay)
+
+        def __len__(self):
+            return len(self._heap) - self._cancelled
+
+        def debug(self, debug):
+            """Prints out all stored data for debugging"""
+            if debug:
+                print("scheduled: ", len(self))
+                print("cancelled: ", self._cancelled)
+                print("time_until_next: ", self.time_until_next())
+
+        class _Entry:
+            """Handle of one scheduled callback"""
+            __slots__ = ("_scheduler", "_callback", "_period", "_cancelled")
+
+            def __init__(self, scheduler, callback, period):
+                self._scheduler = scheduler
+                self._callback = callback
+                self._period = period
+                self._cancelled = False
+
+            def cancel(self):
+                """Cancels the callback so it never runs again"""
+                self._scheduler.cancel(self)
+
+            def mark_cancelled(self):
+                """Flags the entry so the scheduler drops it when it reaches the top"""
+                self._cancelled = True
+
+            def is_cancelled(self):
+                """Returns whether the callback was cancelled or was one shot and already ran"""
+                return self._cancelled
+
+            def get_callback(self):
+                """Returns the scheduled callback"""
+                return self._callback
+
+            def get_period(self):
+                """Returns the repeat period in seconds or None if one shot"""
+                return self._period
+
+    class Profiler:
+        """Aggregates the time spent in named stages that can be nested, for example
+        'with profiler.stage("threshold"):', and exports reports of them"""
+        _enabled = True
+
+        def __init__(self, window=1024, trace_events=0):
+            self._window = window
+            self._stages = {}
+            self._local = threading.local()
+            self._lock = threading.Lock()
+            self._trace = collections.deque(maxlen=trace_events) if trace_events else None
+            self._origin = time.perf_counter()
+            self._last_report = self._origin
+
+        @classmethod
+        def set_enabled(cls, enabled):
+            """Globally turns all profilers on or off, where stages cost nothing when off"""
+            cls._enabled = enabled
+
+        @classmethod
+        def is_enabled(cls):
+            """Returns whether profilers are globally turned on"""
+            return cls._enabled
+
+        def stage(self, name):
+            """Returns a context manager that times a stage nested in the current one"""
+            if not ModulesPackage.Profiler._enabled:
+                return ModulesPackage.Profiler._NULL_STAGE
+            return self._Stage(self, name)
+
+        def _get_stack(self):
+            """Returns the stack of stage paths open in the current thread"""
+            try:
+                return self._local.stack
+            except AttributeError:
+                self._local.stack = []
+                return self._local.stack
+
+        def _record(self, path, start, end):
+            """Adds a finished stage to its statistics and the trace"""
+            with self._lock:
+                stats = self._stages.get(path)
+                if stats is None:
+                    stats = self._stages[path] = self._StageStats(self._window)
+                stats.add(end - start)
+                if self._trace is not None:
+                    self._trace.append((path, start, end, threading.get_ident()))
+
+        def reset(self):
+            """Clears all statistics and the trace"""
+            with self._lock:
+                self._stages = {}
+                if self._trace is not None:
+                    self._trace.clear()
+
+        def stats(self):
+            """Returns a dictionary of count, total, mean, min, max and percentile seconds of
+            each stage path"""
+            with self._lock:
+                return {path: stats.get() for path, stats in self._stages.items()}
+
+        def report_table(self):
+            """Returns the statistics as a text table with nested stages indented"""
+            lines = [f"{'stage':<32}{'count':>8}{'total ms':>11}{'mean ms':>10}"
+                     f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+            for path, stats in sorted(self.stats().items()):
+                name = "  "*path.count("/") + path.rsplit("/", 1)[-1]
+                lines.append(f"{name:<32}{stats['count']:>8}{stats['total']*1000:>11.3f}"
+                             f"{stats['mean']*1000:>10.3f}{stats['p50']*1000:>10.3f}"
+                             f"{stats['p95']*1000:>10.3f}{stats['p99']*1000:>10.3f}"
+                             f"{stats['max']*1000:>10.3f}")
+            return "\n".join(lines)
+
+        def report_json(self):
+            """Returns the statistics as one line of json"""
+            return json.dumps({"time": time.time(), "stages": self.stats()})
+
+        def chrome_trace(self):
+            """Returns the recorded trace in Chrome trace event format for chrome://tracing
+            or Perfetto"""
+            with self._lock:
+                trace = list(self._trace) if self._trace is not None else []
+            return {"traceEvents": [{"name": path.rsplit("/", 1)[-1], "cat": path, "ph": "X",
+                                     "ts": (start - self._origin)*1e6,
+                                     "dur": (end - start)*1e6, "pid": os.getpid(),
+                                     "tid": thread}
+                                    for path, start, end, thread in trace]}
+
+        def write_report(self, stream, report_format=None):
+            """Writes a report in the table, json lines or Chrome trace format to a stream"""
+            report_format = report_format or ModulesPackage.PROFILER_FORMAT_TABLE
+            if report_format == ModulesPackage.PROFILER_FORMAT_TABLE:
+                stream.write(self.report_table() + "\n")
+            elif report_format == ModulesPackage.PROFILER_FORMAT_JSON:
+                stream.write(self.report_json() + "\n")
+            elif report_format == ModulesPackage.PROFILER_FORMAT_CHROME:
+                json.dump(self.chrome_trace(), stream)
+            else:
+                raise ValueError(f"Unknown report format {report_format}")
+            stream.flush()
+
+        def maybe_report(self, interval, stream, report_format=None):
+            """Writes a report if interval seconds passed since the last one and returns
+            whether it did"""
+            now = time.perf_counter()
+            if now - self._last_report < interval:
+                return False
+            self._last_report = now
+            self.write_report(stream, report_format)
+            return True
+
+        def debug(self, debug):
+            """Prints out values of all variables for debugging"""
+            if debug:
+                print(self.report_table())
+
+        class _Stage:
+            """Context manager that times one stage"""
+            __slots__ = ("_profiler", "_name", "_path", "_start")
+
+            def __init__(self, profiler, name):
+                self._profiler = profiler
+                self._name = name
+                self._path = None
+                self._start = None
+
+            def __enter__(self):
+                stack = self._profiler._get_stack()
+                self._path = stack[-1] + "/" + self._name if stack else self._name
+                stack.append(self._path)
+                self._start = time.perf_counter()
+                return self
+
+            def __exit__(self, exc_type, exc_value, exc_traceback):
+                end = time.perf_counter()
+                self._profiler._get_stack().pop()
+                self._profiler._record(self._path, self._start, end)
+
+        class _NullStage:
+            """Context manager that does nothing for when profiling is off"""
+            __slots__ = ()
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, exc_type, exc_value, exc_traceback):
+                pass
+        _NULL_STAGE = _NullStage()
+
+        class _StageStats:
+            """Statistics of one stage, with percentiles over a ring buffer of its most recent
+            runs so recording stays a single array write"""
+            def __init__(self, window):
+                self._count = 0
+                self._total = 0.0
+                self._min = float("inf")
+                self._max = 0.0
+                self._elapsed_times = np.zeros(window)
+
+            def add(self, elapsed_time):
+                """Records one run of the stage"""
+                self._elapsed_times[self._count % len(self._elapsed_times)] = elapsed_time
+                self._count += 1
+                self._total += elapsed_time
+                if elapsed_time < self._min:
+                    self._min = elapsed_time
+                if elapsed_time > self._max:
+                    self._max = elapsed_time
+
+            def get(self):
+                """Returns the statistics as a dictionary"""
+                recent = self._elapsed_times[:min(self._count, len(self._elapsed_times))]
+                p50, p95, p99 = np.percentile(recent, (50, 95, 99)).tolist()
+                return {"count": self._count, "total": self._total,
+                        "mean": self._total/self._count, "min": self._min, "max": self._max,
+                        "p50": p50, "p95": p95, "p99": p99}
+
+    class Metrics:
+        """Registry of counters, gauges and histograms exported in Prometheus text format from
+        a local http server thread or as json lines to a file. Recording only increments a
+        counter or writes a ring buffer slot, and gauges read their sources when exported, so
+        the loop being measured never formats or prints anything"""
+        def __init__(self, namespace="modules"):
+            self._namespace = namespace
+            self._metrics = {}
+            self._lock = threading.Lock()
+            self._server = None
+            self._server_thread = None
+            self._writer_thread = None
+            self._writer_stop = threading.Event()
+
+        def counter(self, name, help_text=""):
+            """Returns the counter with this name, creating it if needed"""
+            return self._register(name, lambda: self._Counter(help_text))
+
+        def gauge(self, name, callback, help_text=""):
+            """Registers a gauge whose callback is called at export time and returns a number,
+            None to skip it, or a dictionary of them each exported as 'name_key'"""
+            return self._register(name, lambda: self._Gauge(callback, help_text))
+
+        def histogram(self, name, help_text="", window=1024):
+            """Returns the histogram with this name, creating it if needed, which is exported
+            as a Prometheus summary with quantiles over its last window observations"""
+            return self._register(name, lambda: self._Histogram(window, help_text))
+
+        def _register(self, name, factory):
+            """Returns the metric registered under the name or registers a new one"""
+            name = self._full_name(name)
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = factory()
+                return metric
+
+        def unregister(self, name):
+            """Removes a metric, for example a gauge whose source was closed"""
+            with self._lock:
+                self._metrics.pop(self._full_name(name), None)
+
+        def _full_name(self, name):
+            """Returns the name prefixed by the namespace with characters Prometheus does not
+            allow replaced"""
+            name = re.sub(r"[^a-zA-Z0-9_]", "_", name)
+            return self._namespace + "_" + name if self._namespace else name
+
+        def track_fps(self, fps, name="fps"):
+            """Exports the frame time and fps statistics of an Fps"""
+            self.gauge(name, fps.stats, "Frame time seconds and frames per second")
+
+        def track_timer(self, timer, name):
+            """Exports the elapsed seconds of a Timer"""
+            self.gauge(name + "_seconds", timer.get_elapsed_time, "Timer elapsed seconds")
+
+        def track_keyboard(self, keyboard, name="keyboard"):
+            """Exports the event queue depth and the dropped and coalesced event counts of a
+            Keyboard"""
+            events = keyboard.get_events()
+            self.gauge(name + "_events", lambda: {"queue_depth": events.qsize(),
+                                                  "dropped": events.get_dropped(),
+                                                  "coalesced": events.get_coalesced()},
+                       "Keyboard event queue depth and dropped and coalesced events")
+
+        def track_read_dir(self, read_dir, name="read_dir"):
+            """Exports the cache size and prefetch counts of a ReadDir"""
+            cache = read_dir.get_cache()
+            self.gauge(name + "_cache_bytes", cache.get_nbytes, "Bytes of decoded images cached")
+            self.gauge(name + "_prefetch", read_dir.get_prefetch_stats,
+                       "Images that prefetching had ready, still decoding or not queued")
+
+        def track_stats(self, name, get_stats, help_text=""):
+            """Exports the numeric values of a get_stats method, for example of a Pipeline,
+            Recorder or Display"""
+            self.gauge(name, get_stats, help_text)
+
+        def collect(self):
+            """Returns (name, type, help, samples) of every metric, where samples are
+            (suffix, labels, value) and gauge callbacks that fail are skipped"""
+            with self._lock:
+                metrics = list(self._metrics.items())
+            collected = []
+            for name, metric in metrics:
+                try:
+                    samples = metric.samples()
+                except Exception:  # pylint: disable=broad-except
+                    continue
+                collected.append((name, metric.TYPE, metric.get_help(), samples))
+            return collected
+
+        def report_prometheus(self):
+            """Returns all metrics in the Prometheus text exposition format, where every
+            sample suffix except a summary's names its own metric family"""
+            lines = []
+            for name, metric_type, help_text, samples in self.collect():
+                family = None
+                for suffix, labels, value in samples:
+                    sample_family = name if metric_type == "summary" else name + suffix
+                    if sample_family != family:
+                        family = sample_family
+                        if help_text:
+                            lines.append(f"# HELP {family} {self._escape(help_text, False)}")
+                        lines.append(f"# TYPE {family} {metric_type}")
+                    label_text = ",".join(f'{key}="{self._escape(str(label))}"'
+                                          for key, label in labels.items())
+                    lines.append(f"{name}{suffix}{{{label_text}}} {float(value)!r}"
+                                 if label_text else f"{name}{suffix} {float(value)!r}")
+            return "\n".join(lines) + "\n"
+
+        @staticmethod
+        def _escape(text, quotes=True):
+            """Escapes backslashes, newlines and, in label values, double quotes"""
+            text = text.replace("\\", "\\\\").replace("\n", "\\n")
+            return text.replace('"', '\\"') if quotes else text
+
+        def report_json(self):
+            """Returns all metrics as one line of json"""
+            metrics = {}
+            for name, _, _, samples in self.collect():
+                for suffix, labels, value in samples:
+                    key = name + suffix
+                    if labels:
+                        metrics.setdefault(key, {})[
+                            ",".join(str(label) for label in labels.values())] = value
+                    else:
+                        metrics[key] = value
+            return json.dumps({"time": time.time(), "metrics": metrics})
+
+        def serve(self, port=9100, host="127.0.0.1"):
+            """Serves the metrics at /metrics from a background thread and returns the port,
+            which is chosen by the system if port is 0"""
+            import http.server
+            if self._server is not None:
+                raise ModulesPackage.MetricsError("Metrics are already being served")
+            metrics = self
+
+            class Handler(http.server.BaseHTTPRequestHandler):
+                """Answers scrapes of /metrics"""
+                def do_GET(self):  # pylint: disable=invalid-name
+                    """Writes the Prometheus report or a 404"""
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = metrics.report_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):  # pylint: disable=arguments-differ
+                    """Keeps scrapes from writing to stderr"""
+
+            self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+            self._server.daemon_threads = True
+            self._server_thread = threading.Thread(target=self._server.serve_forever,
+                                                   daemon=True, name="MetricsServer")
+            self._server_thread.start()
+            return self._server.server_address[1]
+
+        def write_periodically(self, path, interval=10.0):
+            """Appends a json line of all metrics to a file every interval seconds from a
+            background thread"""
+            if self._writer_thread is not None:
+                raise ModulesPackage.MetricsError("Metrics are already being written")
+            self._writer_stop.clear()
+
+            def write():
+                with open(path, "a") as metrics_file:
+                    while not self._writer_stop.wait(interval):
+                        metrics_file.write(self.report_json() + "\n")
+                        metrics_file.flush()
+                    metrics_file.write(self.report_json() + "\n")
+
+            self._writer_thread = threading.Thread(target=write, daemon=True,
+                                                   name="MetricsWriter")
+            self._writer_thread.start()
+
+        def close(self):
+            """Stops serving and writes a last json line before stopping the writer"""
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server_thread.join()
+                self._server = None
+            if self._writer_thread is not None:
+                self._writer_stop.set()
+                self._writer_thread.join()
+                self._writer_thread = None
+
+        def debug(self, debug):
+            """Prints out values of all variables for debugging"""
+            if debug:
+                print(self.report_prometheus(), end="")
+
+        def get_port(self):
+            """Returns the port metrics are served on or None"""
+            return None if self._server is None else self._server.server_address[1]
+
+        class _Counter:
+            """Counter incremented without a lock, relying on next() of an itertools.count
+            being atomic"""
+            TYPE = "counter"
+            __slots__ = ("_help", "_increments", "_reads", "inc")
+
+            def __init__(self, help_text):
+                self._help = help_text
+                self._increments = itertools.count()
+                self._reads = itertools.count()
+                self.inc = functools.partial(next, self._increments)
+
+            def get(self):
+                """Returns the number of increments, where each read also advances both
+                counts by one"""
+                return next(self._increments) - next(self._reads)
+
+            def samples(self):
+                """Returns the export samples"""
+                return [("_total", {}, self.get())]
+
+            def get_help(self):
+                """Returns the help text"""
+                return self._help
+
+        class _Gauge:
+            """Gauge whose value is read from a callback at export time"""
+            TYPE = "gauge"
+
+            def __init__(self, callback, help_text):
+                self._callback = callback
+                self._help = help_text
+
+            def samples(self):
+                """Returns the export samples, one suffixed by its key per numeric dictionary
+                value"""
+                value = self._callback()
+                if isinstance(value, dict):
+                    return [("_" + re.sub(r"[^a-zA-Z0-9_]", "_", str(key)), {}, item)
+                            for key, item in value.items()
+                            if isinstance(item, (int, float)) and not isinstance(item, bool)]
+                if value is None:
+                    return []
+                return [("", {}, value)]
+
+            def get_help(self):
+                """Returns the help text"""
+                return self._help
+
+        class _Histogram:
+            """Observations kept in a ring buffer so recording is a single array write, with
+            quantiles computed over the buffer at export time"""
+            TYPE = "summary"
+            QUANTILES = (0.5, 0.9, 0.99)
+
+            def __init__(self, window, help_text):
+                self._help = help_text
+                self._values = np.zeros(window)
+                self._count = 0
+                self._sum = 0.0
+
+            def observe(self, value):
+                """Records one observation"""
+                self._values[self._count % len(self._values)] = value
+                self._count += 1
+                self._sum += value
+
+            def samples(self):
+                """Returns the export samples"""
+                count, total = self._count, self._sum
+                samples = []
+                if count:
+                    recent = self._values[:min(count, len(self._values))]
+                    for quantile, value in zip(self.QUANTILES,
+                                               np.quantile(recent, self.QUANTILES).tolist()):
+                        samples.append(("", {"quantile": quantile}, value))
+                return samples + [("_sum", {}, total), ("_count", {}, count)]
+
+            def get_help(self):
+                """Returns the help text"""
+                return self._help
+
     class InitBashArgs:
         """Initalizes the arguements present for bash execution which will be different for each
         application of this wrapper"""
@@ -524,6 +3072,7 @@ class ModulesPackage:
                                                                 window_detection_name= \
                                                                 self._window_detection_name,
                                                                 bounds=channel_bounds[i])
+            self._roi = None
 
         def create_trackbar(self):
             """Creates the trackbars used for easy calibration"""
@@ -533,20 +3082,164 @@ class ModulesPackage:
 
         def processing(self, frame, iterations=2):
             """Thresholds, removes noise, and returns the contours"""
-            keys = list(self._channels)
-            frame_threshold = cv2.inRange(frame,
-                                        (self._channels[keys[0]].get_low(),
-                                         self._channels[keys[1]].get_low(),
-                                         self._channels[keys[2]].get_low()),
-                                        (self._channels[keys[0]].get_high(),
-                                         self._channels[keys[1]].get_high(),
-                                         self._channels[keys[2]].get_high()))
+            return self._external_contours(self._mask(frame, iterations))
+
+        @staticmethod
+        def find_contours(frame_threshold, iterations=2):
+            """Removes noise from a thresholded frame and returns its external contours"""
+            return ModulesPackage.ColorTracker._external_contours(
+                ModulesPackage.ColorTracker._denoise(frame_threshold, iterations))
+
+        def _mask(self, frame, iterations):
+            """Thresholds a frame with the channel bounds and removes noise"""
+            lows, highs = self.get_bounds()
+            return self._denoise(cv2.inRange(frame, lows, highs), iterations)
+
+        @staticmethod
+        def _denoise(frame_threshold, iterations):
+            """Erodes then dilates a thresholded frame to remove specks"""
             frame_erode = cv2.erode(frame_threshold, None, iterations=iterations)
-            frame_dilate = cv2.dilate(frame_erode, None, iterations=iterations)
+            return cv2.dilate(frame_erode, None, iterations=iterations)
 
-            contours, _ = cv2.findContours(frame_dilate.copy(), cv2.RETR_EXTERNAL,
-                                        cv2.CHAIN_APPROX_SIMPLE)
-            return contours.copy()
+        @staticmethod
+        def _external_contours(mask, offset=(0, 0)):
+            """Returns the external contours of a mask, shifted by offset"""
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                           offset=offset)
+            return contours
+
+        def blobs(self, frame, iterations=2, min_area=0, max_area=None, min_aspect=None,
+                  max_aspect=None, top_k=None, mean_color=False):
+            """Thresholds, removes noise, and returns one COLORTRACKER_BLOB_DTYPE record per
+            blob instead of contours"""
+            return self.find_blobs(self._mask(frame, iterations), frame if mean_color else None,
+                                   min_area, max_area, min_aspect, max_aspect, top_k)
+
+        @staticmethod
+        def find_blobs(mask, frame=None, min_area=0, max_area=None, min_aspect=None,
+                       max_aspect=None, top_k=None, connectivity=8):
+            """Returns a structured array of the label, area, centroid, bounding box and, if
+            the frame is given, mean color of the connected components of a mask. Blobs are
+            filtered by area and width/height aspect and, if top_k is given, only the largest
+            top_k are kept ordered by decreasing area, all without a loop over the blobs"""
+            # Grana's block based labeling measured several times faster than the default
+            # algorithm on sparse masks
+            count, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+                mask, connectivity, cv2.CV_32S, cv2.CCL_GRANA)
+            stats, centroids = stats[1:], centroids[1:]
+            area = stats[:, cv2.CC_STAT_AREA]
+            width = stats[:, cv2.CC_STAT_WIDTH]
+            height = stats[:, cv2.CC_STAT_HEIGHT]
+
+            keep = area >= min_area
+            if max_area is not None:
+                keep &= area <= max_area
+            if min_aspect is not None or max_aspect is not None:
+                aspect = width/height
+                if min_aspect is not None:
+                    keep &= aspect >= min_aspect
+                if max_aspect is not None:
+                    keep &= aspect <= max_aspect
+            indices = np.flatnonzero(keep)
+            if top_k is not None and len(indices) > top_k:
+                indices = indices[np.argpartition(-area[indices], top_k - 1)[:top_k]]
+            if top_k is not None:
+                indices = indices[np.argsort(-area[indices], kind="stable")]
+
+            blobs = np.empty(len(indices), dtype=ModulesPackage.COLORTRACKER_BLOB_DTYPE)
+            blobs["label"] = indices + 1
+            blobs["area"] = area[indices]
+            blobs["cx"] = centroids[indices, 0]
+            blobs["cy"] = centroids[indices, 1]
+            blobs["x"] = stats[indices, cv2.CC_STAT_LEFT]
+            blobs["y"] = stats[indices, cv2.CC_STAT_TOP]
+            blobs["width"] = width[indices]
+            blobs["height"] = height[indices]
+            if frame is None:
+                blobs["color"] = np.nan
+            elif len(indices):
+                # Only foreground pixels are summed so the cost follows the blobs' area
+                foreground = np.flatnonzero(mask)
+                flat_labels = labels.ravel()[foreground]
+                pixels = frame.reshape(-1, frame.shape[2] if frame.ndim == 3 else 1)[foreground]
+                for channel in range(pixels.shape[1]):
+                    sums = np.bincount(flat_labels, weights=pixels[:, channel], minlength=count)
+                    blobs["color"][:, channel] = sums[indices + 1]/blobs["area"]
+                blobs["color"][:, pixels.shape[1]:] = np.nan
+            return blobs
+
+        def track(self, frame, iterations=2, margin=0.5, padding=16, search_levels=0):
+            """Returns contours like processing but only searches around where the previous
+            contours were. When the target is lost the whole frame is searched in the same
+            call, downscaled search_levels times with cv2.pyrDown to cheaply find where to look
+            at full size"""
+            contours = []
+            if self._roi is not None:
+                contours = self._processing_region(frame, self._roi, iterations)
+            if not len(contours):
+                # The target left the region or was not tracked yet so search the whole frame
+                if search_levels:
+                    roi = self._search_downscaled(frame, search_levels, padding + 2*iterations)
+                    if roi is not None:
+                        contours = self._processing_region(frame, roi, iterations)
+                else:
+                    contours = self.processing(frame, iterations)
+            self._roi = self._expand_roi(contours, frame.shape, margin, padding + 2*iterations)
+            return contours
+
+        def _processing_region(self, frame, roi, iterations):
+            """Processes only a region of the frame and returns contours in frame coordinates"""
+            x, y, width, height = roi
+            return self._external_contours(self._mask(frame[y:y+height, x:x+width], iterations),
+                                           (x, y))
+
+        def _search_downscaled(self, frame, levels, padding):
+            """Thresholds a downscaled frame and returns the full size region holding every
+            match grown by padding pixels or None if nothing matched"""
+            small = frame
+            for _ in range(levels):
+                small = cv2.pyrDown(small)
+            lows, highs = self.get_bounds()
+            points = cv2.findNonZero(cv2.inRange(small, lows, highs))
+            if points is None:
+                return None
+            x, y, width, height = cv2.boundingRect(points)
+            scale = 2**levels
+            return self._clip_roi(x*scale - scale - padding, y*scale - scale - padding,
+                                  (x + width + 1)*scale + padding,
+                                  (y + height + 1)*scale + padding, frame.shape)
+
+        @classmethod
+        def _expand_roi(cls, contours, shape, margin, padding):
+            """Returns the bounding box of all contours grown by margin of its size plus padding
+            pixels, or None if there are no contours"""
+            if not len(contours):
+                return None
+            x, y, width, height = cv2.boundingRect(np.concatenate(contours))
+            grow_x = int(width*margin) + padding
+            grow_y = int(height*margin) + padding
+            return cls._clip_roi(x - grow_x, y - grow_y, x + width + grow_x,
+                                 y + height + grow_y, shape)
+
+        @staticmethod
+        def _clip_roi(left, top, right, bottom, shape):
+            """Returns an (x, y, width, height) region clipped to the frame"""
+            left, top = max(left, 0), max(top, 0)
+            right, bottom = min(right, shape[1]), min(bottom, shape[0])
+            return left, top, right - left, bottom - top
+
+        def reset_tracking(self):
+            """Forgets the tracked region so the next track call searches the whole frame"""
+            self._roi = None
+
+        def get_roi(self):
+            """Returns the (x, y, width, height) region the next track call will process"""
+            return self._roi
+
+        def get_bounds(self):
+            """Returns the lower and higher bounds of all channels as two tuples"""
+            return (tuple(channel.get_low() for channel in self._channels.values()),
+                    tuple(channel.get_high() for channel in self._channels.values()))
 
         def get_channels(self):
             """Returns a deepcopy of the channels of the colorspace"""
@@ -596,3 +3289,505 @@ class ModulesPackage:
             def get_max_value(self):
                 """Returns max value of the channel"""
                 return self._max_value
+
+    class ColorTrackerSweep:
+        """Scores combinations of ColorTracker channel bounds and erode/dilate iterations over
+        every frame of a recorded session on a process pool, against labeled masks if given or
+        else by how steadily the tracked blob moves. Configs are scored on the contours
+        ColorTracker.processing would return, with channel thresholds shared between configs
+        that have them in common"""
+        def __init__(self, session_dir, configs, labels_dir=None, conversion=None, workers=None,
+                     chunk_size=64):
+            self._session_dir = session_dir
+            self._configs = [(tuple(tuple(bound) for bound in bounds), iterations)
+                             for bounds, iterations in configs]
+            self._labels_dir = labels_dir
+            self._conversion = conversion
+            self._workers = workers
+            self._chunk_size = chunk_size
+            self._results = []
+
+        @staticmethod
+        def grid(channel_bounds, iterations=(1, 2, 3)):
+            """Returns every combination of per channel candidate (low, high) bounds and
+            iterations as (channel_bounds, iterations) configs"""
+            return [(bounds, iteration)
+                    for bounds in itertools.product(*channel_bounds)
+                    for iteration in iterations]
+
+        @staticmethod
+        def sample(configs, count, seed=0):
+            """Returns a random subset of count configs, for example of a grid too big to run
+            whole, which still shares thresholded masks between configs"""
+            rng = np.random.default_rng(seed)
+            indices = rng.choice(len(configs), size=min(count, len(configs)), replace=False)
+            return [configs[i] for i in sorted(indices)]
+
+        def run(self):
+            """Scores every config on every frame and returns results ranked best first"""
+            if ModulesPackage.DirectoryManagement.FrameStore.is_store(self._session_dir):
+                nums = list(ModulesPackage.DirectoryManagement.FrameStore(
+                    self._session_dir).open().get_nums())
+                sources = list(range(len(nums)))
+            else:
+                _, _, sources = ModulesPackage.DirectoryManagement.index_dir(self._session_dir)
+                nums = [int(''.join(filter(str.isdigit, name))) for name in sources]
+            if not sources:
+                raise ValueError(f"No frames to score in {self._session_dir}")
+            labels = {}
+            if self._labels_dir is not None:
+                _, _, label_names = ModulesPackage.DirectoryManagement.index_dir(
+                    self._labels_dir)
+                labels = {int(''.join(filter(str.isdigit, name))):
+                          os.path.join(self._labels_dir, name) for name in label_names}
+
+            chunks = [(self._session_dir, sources[i:i+self._chunk_size],
+                       [labels.get(num) for num in nums[i:i+self._chunk_size]],
+                       self._configs, self._conversion)
+                      for i in range(0, len(sources), self._chunk_size)]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self._workers) as executor:
+                chunk_metrics = list(executor.map(self._score_chunk, chunks))
+            self._results = self._rank(chunk_metrics)
+            return self._results
+
+        @staticmethod
+        def _score_chunk(chunk):
+            """Worker task that returns label overlap sums and per frame blob area and centroid
+            of every config over a chunk of frames"""
+            session_dir, sources, label_paths, configs, conversion = chunk
+            frames = None
+            if ModulesPackage.DirectoryManagement.FrameStore.is_store(session_dir):
+                frames = ModulesPackage.DirectoryManagement.FrameStore(
+                    session_dir).open().get_frames()
+            overlaps = np.zeros((len(configs), 3))
+            labeled = 0
+            blobs = np.full((len(sources), len(configs), 3), np.nan, dtype=np.float32)
+
+            by_bounds = collections.defaultdict(list)
+            for index, (bounds, iterations) in enumerate(configs):
+                by_bounds[bounds].append((iterations, index))
+
+            for frame_index, source in enumerate(sources):
+                if frames is not None:
+                    frame = np.asarray(frames[source])
+                else:
+                    frame = cv2.imread(os.path.join(session_dir, source))
+                if conversion is not None:
+                    frame = cv2.cvtColor(frame, conversion)
+                label = None
+                if label_paths[frame_index] is not None:
+                    label = cv2.imread(label_paths[frame_index], cv2.IMREAD_GRAYSCALE)
+                    labeled += 1
+                channels = cv2.split(frame)
+                channel_masks = {}
+
+                for bounds, runs in by_bounds.items():
+                    masks = []
+                    for channel, (low, high) in enumerate(bounds):
+                        key = (channel, low, high)
+                        if key not in channel_masks:
+                            channel_masks[key] = cv2.inRange(channels[channel], low, high)
+                        masks.append(channel_masks[key])
+                    frame_threshold = cv2.bitwise_and(cv2.bitwise_and(masks[0], masks[1]),
+                                                      masks[2])
+                    for iterations, index in runs:
+                        contours = ModulesPackage.ColorTracker.find_contours(frame_threshold,
+                                                                             iterations)
+                        if label is not None:
+                            # The region the contours enclose is what the tracker reports
+                            reported = np.zeros_like(frame_threshold)
+                            cv2.drawContours(reported, contours, -1, 255, cv2.FILLED)
+                            intersection = cv2.countNonZero(cv2.bitwise_and(reported, label))
+                            union = cv2.countNonZero(cv2.bitwise_or(reported, label))
+                            overlaps[index] += (intersection, union,
+                                                intersection/union if union else 1.0)
+                        area = center_x = center_y = 0.0
+                        for contour in contours:
+                            moments = cv2.moments(contour)
+                            area += moments["m00"]
+                            center_x += moments["m10"]
+                            center_y += moments["m01"]
+                        if area:
+                            blobs[frame_index, index] = (area, center_x/area, center_y/area)
+            return overlaps, labeled, blobs, frame.shape[:2] if sources else (0, 0)
+
+        def _rank(self, chunk_metrics):
+            """Combines chunk metrics into one scored result per config, best first"""
+            overlaps = sum(metrics[0] for metrics in chunk_metrics)
+            labeled = sum(metrics[1] for metrics in chunk_metrics)
+            blobs = np.concatenate([metrics[2] for metrics in chunk_metrics])
+            height, width = chunk_metrics[0][3]
+            diagonal = float(np.hypot(height, width))
+
+            detected = ~np.isnan(blobs[:, :, 0])
+            detection_rate = detected.mean(axis=0)
+            steps = np.abs(np.diff(blobs, axis=0))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_area = np.nanmean(blobs[:, :, 0], axis=0)
+                coverage = np.nan_to_num(np.nansum(blobs[:, :, 0], axis=0) /
+                                         (len(blobs)*height*width))
+                area_change = np.nanmean(steps[:, :, 0], axis=0)/mean_area
+                centroid_shift = np.nanmean(np.hypot(steps[:, :, 1], steps[:, :, 2]),
+                                            axis=0)/diagonal
+
+            results = []
+            for index, (bounds, iterations) in enumerate(self._configs):
+                result = {"bounds": bounds, "iterations": iterations,
+                          "detection_rate": float(detection_rate[index]),
+                          "coverage": float(coverage[index]),
+                          "area_change": float(np.nan_to_num(area_change[index], nan=1.0)),
+                          "centroid_shift": float(np.nan_to_num(centroid_shift[index], nan=1.0))}
+                if labeled:
+                    result["iou"] = float(overlaps[index][0]/overlaps[index][1]) \
+                        if overlaps[index][1] else 1.0
+                    result["mean_frame_iou"] = float(overlaps[index][2]/labeled)
+                    result["score"] = result["mean_frame_iou"]
+                else:
+                    # Masks covering the whole frame are perfectly steady but track nothing
+                    result["score"] = result["detection_rate"]*(1.0 - result["coverage"]) / \
+                        (1.0 + result["area_change"] + result["centroid_shift"])
+                results.append(result)
+            results.sort(key=lambda result: result["score"], reverse=True)
+            for rank, result in enumerate(results, 1):
+                result["rank"] = rank
+            return results
+
+        def write_table(self, path):
+            """Writes the ranked results of the last run as a csv table"""
+            if not self._results:
+                raise ValueError("No results to write. Use .run() first")
+            fields = ["rank", "score"] + [field for field in self._results[0]
+                                          if field not in ("rank", "score")]
+            with open(path, "w", newline="") as table_file:
+                writer = csv.DictWriter(table_file, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(self._results)
+
+        def get_results(self):
+            """Returns the ranked results of the last run"""
+            return self._results
+
+    class MultiColorTracker:
+        """Tracks several colors in one frame by classifying every pixel against the channel
+        bounds of all colors in a single lookup table pass"""
+        def __init__(self, color_bounds, conversion=None):
+            self._color_bounds = color_bounds
+            self._colors = list(color_bounds)
+            self._conversion = conversion
+            self._bounds = None
+            self._luts = []
+
+        def _get_bounds(self):
+            """Returns lower and higher bounds of every color, reading them from ColorTrackers
+            so trackbar changes apply"""
+            bounds = []
+            for color in self._colors:
+                source = self._color_bounds[color]
+                if isinstance(source, ModulesPackage.ColorTracker):
+                    bounds.append(source.get_bounds())
+                else:
+                    bounds.append((tuple(bound[0] if len(bound) == 2 else 0 for bound in source),
+                                   tuple(bound[1] if len(bound) == 2 else 255
+                                         for bound in source)))
+            return bounds
+
+        def _build_luts(self, bounds):
+            """Builds per channel lookup tables whose bits mark which colors a value is in, with
+            up to eight colors per group of tables"""
+            values = np.arange(256)
+            self._luts = []
+            for first in range(0, len(bounds), 8):
+                luts = np.zeros((3, 256), dtype=np.uint8)
+                for bit, (lows, highs) in enumerate(bounds[first:first+8]):
+                    for channel in range(3):
+                        inside = (values >= lows[channel]) & (values <= highs[channel])
+                        luts[channel] |= inside.astype(np.uint8) << bit
+                self._luts.append(luts)
+            self._bounds = bounds
+
+        def _labels(self, frame, bounds):
+            """Returns label images of a converted frame whose bits mark the colors each pixel
+            is in"""
+            if bounds != self._bounds:
+                self._build_luts(bounds)
+            channels = cv2.split(frame)
+            labels = []
+            for luts in self._luts:
+                first, second, third = (cv2.LUT(channel, lut) for channel, lut in zip(channels,
+                                                                                      luts))
+                labels.append(cv2.bitwise_and(cv2.bitwise_and(first, second), third))
+            return labels
+
+        def classify(self, frame):
+            """Converts the colorspace once and returns label images whose bits mark the
+            colors each pixel is in"""
+            if self._conversion is not None:
+                frame = cv2.cvtColor(frame, self._conversion)
+            return self._labels(frame, self._get_bounds())
+
+        def masks(self, frame):
+            """Converts the colorspace once and returns the thresholded mask of every color,
+            from one lookup table pass when there are enough colors to pay for it"""
+            if self._conversion is not None:
+                frame = cv2.cvtColor(frame, self._conversion)
+            bounds = self._get_bounds()
+            if len(bounds) < ModulesPackage.MULTICOLORTRACKER_LUT_MIN_COLORS:
+                return [cv2.inRange(frame, lows, highs) for lows, highs in bounds]
+            labels = self._labels(frame, bounds)
+            return [cv2.bitwise_and(labels[i // 8], 1 << (i % 8)) for i in range(len(bounds))]
+
+        def processing(self, frame, iterations=2):
+            """Thresholds all colors together, removes noise from each mask and returns a
+            dictionary of the contours of each color"""
+            return {color: ModulesPackage.ColorTracker.find_contours(mask, iterations)
+                    for color, mask in zip(self._colors, self.masks(frame))}
+
+        def get_colors(self):
+            """Returns names of the tracked colors"""
+            return self._colors
+
+    class Pipeline:
+        """Runs capture, processing and result collection in separate processes, passing frames
+        through a ring of shared memory slots"""
+        def __init__(self, backend_factory, processor_factory, workers=3, slots=8,
+                     start_timeout=10.0):
+            import multiprocessing
+            self._backend_factory = backend_factory
+            self._processor_factory = processor_factory
+            self._num_workers = workers
+            self._num_slots = max(slots, workers + 1)
+            self._start_timeout = start_timeout
+            self._context = multiprocessing.get_context()
+            self._stop_event = self._context.Event()
+            self._frame_info = self._context.Queue()
+            self._ring_info = self._context.Queue()
+            self._free_slots = self._context.Queue()
+            self._work = self._context.Queue()
+            self._results = self._context.Queue()
+            self._output = self._context.Queue()
+            self._captured = self._context.Value("q", 0)
+            self._processed = self._context.Array("q", workers)
+            self._collected = self._context.Value("q", 0)
+            self._shared_memory = None
+            self._processes = []
+            self._start_time = None
+
+        def start(self):
+            """Starts the capture process, sizes the shared memory ring from its first frame
+            and then starts the worker and collector processes"""
+            import multiprocessing.resource_tracker
+            import multiprocessing.shared_memory
+            # Children must share this process' resource tracker or the first one to exit
+            # would unlink the shared memory ring
+            multiprocessing.resource_tracker.ensure_running()
+            capture = self._context.Process(
+                target=ModulesPackage.Pipeline._capture, name="PipelineCapture",
+                args=(self._backend_factory, self._num_slots, self._num_workers,
+                      self._frame_info, self._ring_info, self._free_slots, self._work,
+                      self._stop_event, self._captured))
+            capture.start()
+            self._processes.append(capture)
+            try:
+                shape, dtype = self._frame_info.get(timeout=self._start_timeout)
+            except queue.Empty:
+                self.stop()
+                raise ModulesPackage.PipelineError(f"Capture produced no frame within "
+                                                   f"{self._start_timeout} seconds")
+            if shape is None:
+                self.stop()
+                raise ModulesPackage.PipelineError(f"Capture failed to start: {dtype}")
+            ring_shape = (self._num_slots,) + tuple(shape)
+            self._shared_memory = multiprocessing.shared_memory.SharedMemory(
+                create=True, size=int(np.prod(ring_shape))*np.dtype(dtype).itemsize)
+            self._ring_info.put((self._shared_memory.name, ring_shape, dtype))
+
+            for worker in range(self._num_workers):
+                self._processes.append(self._context.Process(
+                    target=ModulesPackage.Pipeline._process, name="PipelineWorker" + str(worker),
+                    args=(self._processor_factory, worker, self._shared_memory.name, ring_shape,
+                          dtype, self._work, self._results, self._processed)))
+            self._processes.append(self._context.Process(
+                target=ModulesPackage.Pipeline._collect, name="PipelineCollector",
+                args=(self._num_workers, self._results, self._output, self._collected)))
+            for process in self._processes[1:]:
+                process.start()
+            self._start_time = time.perf_counter()
+            return self
+
+        @staticmethod
+        def _attach(name, shape, dtype):
+            """Attaches to the shared memory ring created by the parent, whose resource tracker
+            child processes share so only the parent's unlink releases it"""
+            import multiprocessing.shared_memory
+            try:
+                shared_memory = multiprocessing.shared_memory.SharedMemory(name=name,
+                                                                           track=False)
+            except TypeError:
+                shared_memory = multiprocessing.shared_memory.SharedMemory(name=name)
+            return shared_memory, np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+
+        @staticmethod
+        def _capture(backend_factory, num_slots, num_workers, frame_info, ring_info,
+                     free_slots, work, stop_event, captured):
+            """Capture process that reads frames straight into free ring slots and reports a
+            failure on frame_info"""
+            backend = None
+            shared_memory = None
+            try:
+                try:
+                    backend = backend_factory().start()
+                    width, height = backend.get_resolution()
+                    first = backend.read(np.empty((height, width, 3), dtype=np.uint8))
+                except Exception as error:  # pylint: disable=broad-except
+                    frame_info.put((None, repr(error)))
+                    return
+                if first is None:
+                    frame_info.put((None, "source has no frames"))
+                    return
+                frame_info.put((first.shape, first.dtype.str))
+                while not stop_event.is_set():
+                    try:
+                        name, ring_shape, dtype = ring_info.get(timeout=0.1)
+                        break
+                    except queue.Empty:
+                        pass
+                else:
+                    return
+                shared_memory, ring = ModulesPackage.Pipeline._attach(name, ring_shape, dtype)
+                for slot in range(num_slots):
+                    free_slots.put(slot)
+
+                sequence = 0
+                frame = first
+                while frame is not None and not stop_event.is_set():
+                    try:
+                        slot = free_slots.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if sequence:
+                        frame = backend.read(ring[slot])
+                        if frame is None:
+                            break
+                    if not np.may_share_memory(frame, ring[slot]):
+                        np.copyto(ring[slot], frame)
+                    work.put((sequence, slot, time.monotonic()))
+                    sequence += 1
+                    with captured.get_lock():
+                        captured.value += 1
+                del ring
+            except Exception as error:  # pylint: disable=broad-except
+                frame_info.put((None, repr(error)))
+            finally:
+                # Workers only exit on these so they are sent however capture ended
+                for _ in range(num_workers):
+                    work.put(None)
+                if backend is not None:
+                    try:
+                        backend.stop()
+                    except Exception:  # pylint: disable=broad-except
+                        pass
+                if shared_memory is not None:
+                    shared_memory.close()
+
+        @staticmethod
+        def _process(processor_factory, worker, name, ring_shape, dtype, work, results,
+                     processed):
+            """Worker process that runs the processor on ring slots in place"""
+            shared_memory, ring = ModulesPackage.Pipeline._attach(name, ring_shape, dtype)
+            processor = processor_factory()
+            while True:
+                item = work.get()
+                if item is None:
+                    break
+                sequence, slot, timestamp = item
+                try:
+                    result = processor(ring[slot])
+                except Exception as error:  # pylint: disable=broad-except
+                    result = ModulesPackage.PipelineError(f"Frame {sequence}: {error!r}")
+                results.put((sequence, slot, timestamp, result))
+                processed[worker] += 1
+            results.put(None)
+            del ring
+            shared_memory.close()
+
+        @staticmethod
+        def _collect(num_workers, results, output, collected):
+            """Collector process that reorders results by sequence number, leaving their slots
+            to be freed once the consumer takes them"""
+            pending = []
+            next_sequence = 0
+            finished = 0
+            while finished < num_workers:
+                item = results.get()
+                if item is None:
+                    finished += 1
+                    continue
+                heapq.heappush(pending, item)
+                while pending and pending[0][0] == next_sequence:
+                    output.put(heapq.heappop(pending))
+                    next_sequence += 1
+                    with collected.get_lock():
+                        collected.value += 1
+            output.put(None)
+
+        def results(self, timeout=None):
+            """Yields (sequence, capture timestamp, result) in capture order, freeing each
+            frame's slot only once its result is taken"""
+            while True:
+                try:
+                    item = self._output.get(timeout=timeout)
+                except queue.Empty:
+                    return
+                if item is None:
+                    try:
+                        _, error = self._frame_info.get_nowait()
+                    except queue.Empty:
+                        return
+                    raise ModulesPackage.PipelineError(f"Capture failed: {error}")
+                sequence, slot, timestamp, result = item
+                self._free_slots.put(slot)
+                if isinstance(result, ModulesPackage.PipelineError):
+                    raise result
+                yield sequence, timestamp, result
+
+        def stop(self, timeout=5.0):
+            """Stops capturing, waits up to timeout seconds for the processes to finish before
+            terminating the rest and frees the shared memory ring"""
+            self._stop_event.set()
+            try:
+                for _ in range(self._num_workers):
+                    self._work.put(None)
+                deadline = time.monotonic() + timeout
+                for process in self._processes:
+                    while process.is_alive() and time.monotonic() < deadline:
+                        # Drain so processes blocked on a full pipe can finish
+                        for pipe in (self._output, self._results):
+                            try:
+                                while True:
+                                    pipe.get_nowait()
+                            except queue.Empty:
+                                pass
+                        process.join(timeout=0.1)
+                for process in self._processes:
+                    if process.is_alive():
+                        process.terminate()
+                        process.join()
+            finally:
+                self._processes = []
+                if self._shared_memory is not None:
+                    self._shared_memory.close()
+                    self._shared_memory.unlink()
+                    self._shared_memory = None
+
+        def get_stats(self):
+            """Returns frames captured, processed by each worker and collected, and their
+            rates per second since start"""
+            elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+            processed = list(self._processed)
+            stats = {"captured": self._captured.value, "processed": processed,
+                     "collected": self._collected.value}
+            if elapsed:
+                stats["capture_fps"] = stats["captured"]/elapsed
+                stats["process_fps"] = sum(processed)/elapsed
+                stats["collect_fps"] = stats["collected"]/elapsed
+            return stats